@@ -0,0 +1,298 @@
+"""
+Headless Batch Detection for Image Folders, Glob Lists and Video Directories
+"""
+
+import argparse
+import copy
+import glob
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+
+import cv2
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.detector import SpeedSignDetector
+from src.core.video_processor import VideoProcessor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+LOG_LEVELS = {'ERROR': logging.ERROR, 'WARNING': logging.WARNING}
+
+_detector = None
+
+
+def _glob_root(pattern):
+    """Directory part of a glob pattern before its first wildcard"""
+    parts = Path(pattern).parts
+    literal = list(itertools.takewhile(lambda part: not glob.has_magic(part), parts[:-1]))
+    return Path(*literal) if literal else Path('.')
+
+
+def _output_key(relative, video):
+    """Case-insensitive name of the files written for an input, a video's stem also names its detections file"""
+    return str(relative.with_suffix('') if video else relative).lower()
+
+
+def collect_inputs(patterns, recursive=False):
+    """(images, videos) as (path, relative) pairs from files, directories and glob patterns, in order and without
+    duplicates.
+
+    relative mirrors the path below its input directory (the directory
+    itself, or the fixed part of a glob pattern), so same-named files from
+    different subdirectories keep apart under the output directory. Two
+    inputs that would still write the same output file get a -2, -3...
+    suffix, images and videos are checked separately.
+    """
+    images, videos = {}, {}
+    taken_images, taken_videos = set(), set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            root = path
+            candidates = sorted(path.rglob('*') if recursive else path.iterdir())
+        elif path.is_file():
+            root = path.parent
+            candidates = [path]
+        else:
+            root = _glob_root(pattern)
+            candidates = sorted(Path(match) for match in glob.glob(pattern, recursive=True))
+
+        matched = 0
+        for candidate in candidates:
+            suffix = candidate.suffix.lower()
+            found = images if suffix in IMAGE_EXTENSIONS else videos if suffix in VIDEO_EXTENSIONS else None
+            if found is None:
+                continue
+            matched += 1
+            key = candidate.resolve()
+            if key in images or key in videos:
+                continue
+
+            relative = candidate.relative_to(root)
+            video = found is videos
+            taken = taken_videos if video else taken_images
+            unique, count = relative, 1
+            while _output_key(unique, video) in taken:
+                count += 1
+                unique = relative.with_name(f"{relative.stem}-{count}{relative.suffix}")
+            if unique != relative:
+                logger.warning(f"{candidate} has the same output name as an earlier input, written as {unique}")
+            taken.add(_output_key(unique, video))
+            found[key] = (candidate, unique)
+        if not matched:
+            logger.warning(f"No images or videos match: {pattern}")
+
+    return list(images.values()), list(videos.values())
+
+
+def _init_worker(model_path, config, threads):
+    """One detector per pool process, with the cores split between the workers"""
+    global _detector
+    cv2.setNumThreads(threads)
+    if config.get('model', {}).get('backend', 'pytorch') == 'pytorch':
+        import torch
+        torch.set_num_threads(threads)
+    _detector = SpeedSignDetector(model_path=model_path, config=config)
+    if not _detector.is_model_loaded():
+        raise RuntimeError(f"Model could not be loaded: {model_path}")
+
+
+def output_paths(output_dir, relative):
+    """(annotated output, per-frame detections) paths of an input, mirroring its relative path under output_dir"""
+    target = Path(output_dir) / relative
+    target.parent.mkdir(parents=True, exist_ok=True)
+    return (target.with_name(f"{target.stem}_detected{target.suffix}"),
+            target.with_name(f"{target.stem}.detections.jsonl"))
+
+
+def _detect_images(inputs, output_dir, render):
+    """Worker task: detect a chunk of (path, relative) images, returns per-image records"""
+    start = time.perf_counter()
+    images, records = [], []
+    for path, relative in inputs:
+        image = cv2.imread(str(path))
+        if image is None:
+            records.append({'source': str(path), 'error': 'unreadable'})
+        else:
+            images.append((path, relative, image))
+
+    results = _detector.iter_detect_batch((image for _, _, image in images), render=render, in_place=True)
+    for (path, relative, image), (annotated, detections) in zip(images, results):
+        if render:
+            cv2.imwrite(str(output_paths(output_dir, relative)[0]), annotated)
+        records.append({'source': str(path), 'width': image.shape[1], 'height': image.shape[0],
+                        'detections': [detection.to_dict() for detection in detections]})
+
+    return {'records': records, 'seconds': time.perf_counter() - start}
+
+
+def _detect_video(path, relative, output_dir, render):
+    """Worker task: process one video, detections go to <stem>.detections.jsonl as the frames are done"""
+    # The pool already runs a process per core share, the multiprocess and segment pipelines would start their own
+    # processes on top of each one and oversubscribe the cores
+    detector = _detector
+    processing = detector.config.get('processing', {})
+    if processing.get('pipeline_mode') in ('multiprocess', 'segments'):
+        detector = copy.copy(_detector)
+        detector.config = dict(_detector.config, processing=dict(processing, pipeline_mode='threaded'))
+
+    processor = VideoProcessor(detector)
+    processor.set_log_callback(lambda message, level="INFO": logger.log(LOG_LEVELS.get(level, logging.INFO),
+                                                                        f"{path.name}: {message}"))
+
+    output_path, detections_path = output_paths(output_dir, relative)
+    with open(detections_path, 'w') as f:
+        def write_frame(index, detections):
+            f.write(json.dumps({'frame': index, 'detections': [d.to_dict() for d in detections]}) + '\n')
+
+        success = processor.process_video(str(path), str(output_path) if render else None,
+                                          detections_callback=write_frame)
+
+    stats = dict(processor.stats)
+    stats.update(source=str(path), success=success)
+    return stats
+
+
+def _load_config(args):
+    config = SpeedSignDetector._load_config(args.config)
+    config.setdefault('model', {})
+    config.setdefault('processing', {})
+    if args.conf is not None:
+        config['model']['confidence_threshold'] = args.conf
+    if args.iou is not None:
+        config['model']['iou_threshold'] = args.iou
+    if args.backend is not None:
+        config['model']['backend'] = args.backend
+    if args.batch_size is not None:
+        config['processing']['batch_processing'] = args.batch_size > 1
+        config['processing']['batch_size'] = args.batch_size
+    # Every pool process would open the same database, results go to the output files instead
+    config['processing']['detection_cache'] = args.detection_cache
+    return config
+
+
+def run(args):
+    images, videos = collect_inputs(args.inputs, args.recursive)
+    if not images and not videos:
+        logger.error("Nothing to process")
+        return 1
+
+    config = _load_config(args)
+    model_path = args.model or config['model'].get('yolo_model', 'models/speed_limit_recog/weights/best.pt')
+    if not Path(model_path).exists():
+        logger.error(f"Model not found: {model_path}")
+        return 1
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    render = not args.no_render
+    workers = max(1, args.workers or os.cpu_count() or 1)
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    chunk = max(1, args.chunk_size)
+
+    logger.info(f"{len(images)} images, {len(videos)} videos -> {output_dir} "
+                f"({workers} workers x {threads} threads, {'annotated' if render else 'detections only'})")
+
+    failures = 0
+    image_count = 0
+    detection_count = 0
+    video_stats = []
+    start = time.perf_counter()
+
+    # spawn keeps the workers free of the parent's torch/OpenCV thread pools
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'), initializer=_init_worker,
+                             initargs=(model_path, config, threads)) as pool, \
+            open(output_dir / 'detections.jsonl', 'w') as detections_file:
+        # Videos first, they are the longest tasks
+        tasks = {pool.submit(_detect_video, path, relative, output_dir, render): path for path, relative in videos}
+        for i in range(0, len(images), chunk):
+            tasks[pool.submit(_detect_images, images[i:i + chunk], output_dir, render)] = images[i][0]
+
+        for done, future in enumerate(as_completed(tasks), 1):
+            try:
+                result = future.result()
+            except Exception as e:
+                failures += 1
+                logger.error(f"[{done}/{len(tasks)}] {tasks[future].name} failed: {e}")
+                continue
+
+            if 'records' in result:
+                for record in result['records']:
+                    detections_file.write(json.dumps(record) + '\n')
+                    if 'error' in record:
+                        failures += 1
+                    else:
+                        image_count += 1
+                        detection_count += len(record['detections'])
+                logger.info(f"[{done}/{len(tasks)}] {len(result['records'])} images starting at {tasks[future].name} "
+                            f"in {result['seconds']:.1f}s")
+            else:
+                video_stats.append(result)
+                failures += not result['success']
+                detection_count += result.get('detections', 0)
+                logger.info(f"[{done}/{len(tasks)}] {Path(result['source']).name}: {result.get('frames', 0)} frames "
+                            f"at {result.get('fps', 0.0):.1f} FPS")
+
+    elapsed = time.perf_counter() - start
+    frame_count = sum(stats.get('frames', 0) for stats in video_stats)
+    summary = {
+        'images': image_count,
+        'videos': len(video_stats),
+        'frames': frame_count,
+        'detections': detection_count,
+        'failures': failures,
+        'seconds': elapsed,
+        'images_per_second': image_count / elapsed if elapsed > 0 else 0.0,
+        'frames_per_second': frame_count / elapsed if elapsed > 0 else 0.0,
+        'workers': workers,
+        'threads_per_worker': threads,
+        'video_runs': video_stats,
+    }
+    with open(output_dir / 'summary.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\nProcessed in {elapsed:.1f}s with {workers} workers x {threads} threads:")
+    if images:
+        print(f"  Images: {image_count}/{len(images)} ({summary['images_per_second']:.1f} img/s)")
+    if videos:
+        print(f"  Videos: {len(video_stats)}/{len(videos)}, {frame_count} frames "
+              f"({summary['frames_per_second']:.1f} FPS overall)")
+    print(f"  Detections: {detection_count}")
+    print(f"  Failures: {failures}")
+    print(f"  Outputs: {output_dir}\n")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect speed limit signs in images and videos without the GUI")
+    parser.add_argument('inputs', nargs='+', help="Image/video files, directories or glob patterns")
+    parser.add_argument('--output', default='output/batch', help="Output directory")
+    parser.add_argument('--config', default='config/settings.yaml')
+    parser.add_argument('--model', default=None, help="Model weights (default: model.yolo_model from config)")
+    parser.add_argument('--backend', default=None, help="Inference backend (default: model.backend from config)")
+    parser.add_argument('--conf', type=float, default=None, help="Confidence threshold (default: from config)")
+    parser.add_argument('--iou', type=float, default=None, help="IoU threshold (default: from config)")
+    parser.add_argument('--batch-size', type=int, default=None, help="Images per forward pass (default: from config)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--threads', type=int, default=None, help="Threads per worker (default: CPUs / workers)")
+    parser.add_argument('--chunk-size', type=int, default=32, help="Images per worker task")
+    parser.add_argument('--recursive', action='store_true', help="Search directories recursively")
+    parser.add_argument('--no-render', action='store_true', help="Write detections only, no annotated outputs")
+    parser.add_argument('--detection-cache', action='store_true', help="Use the persistent detection cache")
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
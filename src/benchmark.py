@@ -0,0 +1,404 @@
+"""
+Stage-Level Benchmark Suite for Detection and Video Processing
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.detector import SpeedSignDetector
+from src.core.video_io import open_video_reader, open_video_writer
+from src.core.video_processor import VideoProcessor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DETECT_STAGES = ('preprocess', 'forward', 'postprocess', 'draw')
+
+VIDEO_VARIANTS = {
+    'baseline': {},
+    'threaded': {'pipeline_mode': 'threaded'},
+    'motion_gating': {'motion_gating': True},
+    'tracking': {'tracking_enabled': True},
+    'gating+tracking': {'motion_gating': True, 'tracking_enabled': True},
+    'threaded+batch': {'pipeline_mode': 'threaded', 'batch_processing': True, 'batch_size': 4},
+    'multiprocess': {'pipeline_mode': 'multiprocess'},
+    # Short enough segments that the default 90-frame clips are split at all
+    'segments': {'pipeline_mode': 'segments', 'min_segment_frames': 30},
+    'adaptive_quality': {'adaptive_quality': True},
+    'roi': {'roi_enabled': True},
+}
+
+
+def parse_resolution(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def build_random_model(model_yaml, class_names, output_path):
+    """YOLO model with random weights built from a yaml, so benchmarks need no download or training"""
+    from ultralytics import YOLO
+    from ultralytics.nn.tasks import DetectionModel
+
+    model = YOLO(model_yaml)
+    model.model = DetectionModel(model_yaml, nc=len(class_names), verbose=False)
+    model.model.names = dict(enumerate(class_names))
+    model.model.args = {}
+    model.ckpt = {}
+    model.save(str(output_path))
+    return output_path
+
+
+def synthetic_frames(width, height, count, seed=0):
+    """Gradient background with moving sign-like discs"""
+    rng = np.random.default_rng(seed)
+    background = np.zeros((height, width, 3), dtype=np.uint8)
+    background[..., 0] = np.linspace(40, 200, width, dtype=np.uint8)[None, :]
+    background[..., 1] = np.linspace(60, 160, height, dtype=np.uint8)[:, None]
+    background[..., 2] = 90
+
+    signs = [(rng.uniform(0, width), rng.uniform(0, height), rng.uniform(-8, 8), rng.uniform(-4, 4),
+              int(rng.integers(height // 30 + 5, height // 8 + 10))) for _ in range(4)]
+
+    for index in range(count):
+        frame = background.copy()
+        for x, y, dx, dy, radius in signs:
+            center = (int(x + dx * index) % width, int(y + dy * index) % height)
+            cv2.circle(frame, center, radius, (0, 0, 220), -1)
+            cv2.circle(frame, center, int(radius * 0.75), (255, 255, 255), -1)
+        yield frame
+
+
+def load_frames(images_dir, count, width, height):
+    frames = []
+    for image_file in sorted(Path(images_dir).glob('*')):
+        image = cv2.imread(str(image_file))
+        if image is not None:
+            frames.append(cv2.resize(image, (width, height)))
+        if len(frames) >= count:
+            break
+    return frames
+
+
+def write_video(path, frames, fps=30):
+    out = None
+    for frame in frames:
+        if out is None:
+            height, width = frame.shape[:2]
+            out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        out.write(frame)
+    if out is not None:
+        out.release()
+
+
+def benchmark_detect(detector, frames, batch_size, iterations, warmup=1):
+    """Per-frame milliseconds of each detect() stage plus end-to-end frames/sec"""
+    for _ in range(warmup):
+        detector.detect_batch(frames[:batch_size])
+
+    totals = dict.fromkeys(DETECT_STAGES, 0.0)
+    processed = 0
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        for offset in range(0, len(frames), batch_size):
+            batch = frames[offset:offset + batch_size]
+            detector.detect_batch(batch)
+            processed += len(batch)
+            for stage in DETECT_STAGES:
+                totals[stage] += detector.timings.get(stage, 0.0)
+
+    elapsed = time.perf_counter() - start
+    per_frame = {stage: totals[stage] / processed for stage in DETECT_STAGES}
+    per_frame['total'] = elapsed * 1000 / processed
+    return {'frames': processed, 'per_frame_ms': per_frame, 'fps': processed / elapsed if elapsed > 0 else 0.0}
+
+
+def _peak_allocation(work):
+    """Peak bytes allocated (Python and NumPy, as traced by tracemalloc) above what was live before work()"""
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    work()
+    return tracemalloc.get_traced_memory()[1] - before
+
+
+def benchmark_allocations(detector, frames, batch_size, warmup=1):
+    """Per-frame KB allocated in the steady state by preprocessing and by a whole in-place detect_batch().
+
+    Runs separately from the timed passes since tracing slows allocation down.
+    Frames are copied up front so in-place drawing never reaches the inputs.
+    """
+    batches = [[frame.copy() for frame in frames[offset:offset + batch_size]]
+               for offset in range(0, len(frames), batch_size)]
+    preprocess = getattr(detector.backend, 'preprocess', None)
+    for _ in range(warmup):
+        detector.detect_batch(batches[0], in_place=True)
+
+    tracemalloc.start()
+    try:
+        preprocess_bytes = 0
+        if preprocess is not None:
+            preprocess_bytes = max(_peak_allocation(lambda: preprocess(batch)) for batch in batches)
+        detect_bytes = max(_peak_allocation(lambda: detector.detect_batch(batch, in_place=True)) for batch in batches)
+    finally:
+        tracemalloc.stop()
+
+    buffers = getattr(detector.backend, 'buffers', None)
+    return {'preprocess_alloc_kb': preprocess_bytes / 1024 / batch_size if preprocess is not None else None,
+            'detect_alloc_kb': detect_bytes / 1024 / batch_size,
+            'buffer_allocations': buffers.allocations if buffers is not None else None}
+
+
+def benchmark_decode(video_path, config=None, keep_frames=True):
+    """Decode-only milliseconds per frame and the decoded frames, through the configured video I/O when config is given"""
+    cap = cv2.VideoCapture(str(video_path)) if config is None else open_video_reader(video_path, config)
+    frames = []
+    count = 0
+    start = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if keep_frames:
+            frames.append(frame)
+        count += 1
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return elapsed * 1000 / max(count, 1), frames
+
+
+def benchmark_encode(frames, output_path, fps=30, config=None):
+    """Encode-only milliseconds per frame, through the configured video I/O when config is given"""
+    height, width = frames[0].shape[:2]
+    if config is None:
+        out = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    else:
+        out = open_video_writer(output_path, fps, (width, height), config)
+    start = time.perf_counter()
+    for frame in frames:
+        out.write(frame)
+    out.release()
+    return (time.perf_counter() - start) * 1000 / len(frames)
+
+
+def benchmark_video(detector, video_path, variants, work_dir):
+    """Decode-only and encode-only passes, then process_video end to end for each config variant"""
+    decode_ms, frames = benchmark_decode(video_path)
+    if not frames:
+        raise RuntimeError(f"Cannot decode video: {video_path}")
+    encode_ms = benchmark_encode(frames, Path(work_dir) / 'encode_only.mp4')
+    result = {'frames': len(frames), 'decode_ms': decode_ms, 'encode_ms': encode_ms, 'variants': {}}
+    if shutil.which('ffmpeg'):
+        ffmpeg_config = dict(detector.config, video=dict(detector.config.get('video', {}), io_backend='ffmpeg'))
+        result['ffmpeg_decode_ms'], _ = benchmark_decode(video_path, ffmpeg_config, keep_frames=False)
+        result['ffmpeg_encode_ms'] = benchmark_encode(frames, Path(work_dir) / 'encode_only_ffmpeg.mp4',
+                                                      config=ffmpeg_config)
+    del frames
+
+    processing = detector.config.setdefault('processing', {})
+    original = dict(processing)
+    processor = VideoProcessor(detector)
+
+    for name in variants:
+        processing.clear()
+        processing.update(original)
+        processing.update(VIDEO_VARIANTS[name])
+
+        if not processor.process_video(str(video_path), str(Path(work_dir) / f"{name}.mp4")):
+            logger.error(f"{name}: video processing failed")
+            continue
+
+        stats = processor.stats
+        result['variants'][name] = {
+            'fps': stats['fps'],
+            'per_frame_ms': stats['seconds'] * 1000 / max(stats['frames'], 1),
+            'inferences': stats.get('gate_inferences', stats.get('tracker_inferences', stats['frames'])),
+            'skipped': stats.get('skipped', 0),
+        }
+
+    processing.clear()
+    processing.update(original)
+    return result
+
+
+def environment_info(detector):
+    info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'backend': detector.config.get('model', {}).get('backend', 'pytorch'),
+        'model': str(detector.model_path),
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+        info['torch_threads'] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def _result_key(entry):
+    if entry['suite'] == 'detect':
+        return 'detect', entry['resolution'], f"batch={entry['batch_size']}"
+    return 'video', entry['resolution'], entry['variant']
+
+
+def check_regressions(results, baseline_path, threshold):
+    """Entries whose frames/sec dropped more than threshold (a fraction) below the baseline run"""
+    with open(baseline_path, 'r') as f:
+        baseline = {_result_key(entry): entry for entry in json.load(f)['results']}
+
+    regressions = []
+    for entry in results:
+        previous = baseline.get(_result_key(entry))
+        if previous is None or previous['fps'] <= 0:
+            continue
+        change = entry['fps'] / previous['fps'] - 1
+        if change < -threshold:
+            regressions.append(f"{' '.join(_result_key(entry))}: "
+                               f"{previous['fps']:.1f} -> {entry['fps']:.1f} FPS ({change:+.1%})")
+    return regressions
+
+
+def run_detect_suite(detector, resolutions, batch_sizes, frame_count, iterations, images_dir=None):
+    results = []
+    for width, height in resolutions:
+        frames = load_frames(images_dir, frame_count, width, height) if images_dir else []
+        if not frames:
+            frames = list(synthetic_frames(width, height, frame_count))
+
+        for batch_size in batch_sizes:
+            entry = benchmark_detect(detector, frames, batch_size, iterations)
+            entry.update(benchmark_allocations(detector, frames, batch_size))
+            entry.update(suite='detect', resolution=f"{width}x{height}", batch_size=batch_size)
+            results.append(entry)
+
+            stages = ', '.join(f"{stage} {ms:.1f}" for stage, ms in entry['per_frame_ms'].items())
+            allocations = f"detect {entry['detect_alloc_kb']:.0f}"
+            if entry['preprocess_alloc_kb'] is not None:
+                allocations = f"preprocess {entry['preprocess_alloc_kb']:.0f}, {allocations}"
+            logger.info(f"detect {width}x{height} batch={batch_size}: {entry['fps']:.1f} FPS (ms/frame: {stages}; "
+                        f"KB allocated/frame: {allocations})")
+    return results
+
+
+def run_video_suite(detector, resolutions, variants, work_dir, frame_count, video_path=None):
+    videos = []
+    if video_path:
+        cap = cv2.VideoCapture(video_path)
+        size = f"{int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))}"
+        cap.release()
+        videos.append((size, video_path))
+    else:
+        for width, height in resolutions:
+            path = Path(work_dir) / f"synthetic_{width}x{height}.mp4"
+            write_video(path, synthetic_frames(width, height, frame_count))
+            videos.append((f"{width}x{height}", path))
+
+    results = []
+    for size, path in videos:
+        video = benchmark_video(detector, path, variants, work_dir)
+        logger.info(f"video {size}: decode {video['decode_ms']:.1f} ms/frame, encode {video['encode_ms']:.1f} ms/frame")
+        if 'ffmpeg_decode_ms' in video:
+            logger.info(f"video {size}: ffmpeg pipes decode {video['ffmpeg_decode_ms']:.1f} ms/frame, "
+                        f"encode {video['ffmpeg_encode_ms']:.1f} ms/frame")
+
+        for variant, stats in video['variants'].items():
+            results.append(dict(stats, suite='video', resolution=size, variant=variant, frames=video['frames'],
+                                **{key: value for key, value in video.items() if key.endswith('_ms')}))
+            logger.info(f"video {size} {variant:>16}: {stats['fps']:.1f} FPS, {stats['inferences']} inferences, "
+                        f"{stats['skipped']} skipped")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage-level CPU benchmark of SpeedSignDetector and VideoProcessor")
+    parser.add_argument('--model', default=None, help="Model weights (default: random weights from --model-yaml)")
+    parser.add_argument('--model-yaml', default='yolov8s.yaml', help="Architecture for the random-weight model")
+    parser.add_argument('--config', default='config/settings.yaml')
+    parser.add_argument('--backend', default=None, help="Inference backend (default: model.backend from config)")
+    parser.add_argument('--conf', type=float, default=None, help="Confidence threshold (default: from config)")
+    parser.add_argument('--suites', nargs='+', default=['detect', 'video'], choices=['detect', 'video'])
+    parser.add_argument('--resolutions', nargs='+', default=['640x360', '1280x720', '1920x1080'])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--frames', type=int, default=16, help="Frames per detect run")
+    parser.add_argument('--iterations', type=int, default=2)
+    parser.add_argument('--images', default=None, help="Folder of images to use instead of synthetic frames")
+    parser.add_argument('--video', default=None, help="Video file to use instead of synthetic clips")
+    parser.add_argument('--video-frames', type=int, default=90, help="Length of the synthetic clips")
+    parser.add_argument('--video-variants', nargs='+', default=list(VIDEO_VARIANTS), choices=list(VIDEO_VARIANTS))
+    parser.add_argument('--gpu', action='store_true', help="Allow GPU inference (default: CPU only)")
+    parser.add_argument('--output', default=None, help="Write results to this JSON file")
+    parser.add_argument('--baseline', default=None, help="Earlier JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="Allowed FPS drop against the baseline")
+    args = parser.parse_args()
+
+    config = SpeedSignDetector._load_config(args.config)
+    config.setdefault('model', {})
+    config.setdefault('processing', {})['use_gpu'] = args.gpu
+    config['processing']['detection_cache'] = False
+    if args.backend:
+        config['model']['backend'] = args.backend
+    if args.conf is not None:
+        config['model']['confidence_threshold'] = args.conf
+
+    resolutions = [parse_resolution(r) for r in args.resolutions]
+    results = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_path = args.model
+        if model_path is None:
+            class_names = config.get('classes') or [str(i) for i in range(10)]
+            model_path = build_random_model(args.model_yaml, class_names, Path(work_dir) / 'random.pt')
+            logger.info(f"Using random weights from {args.model_yaml}")
+
+        detector = SpeedSignDetector(model_path=model_path, config=config)
+        if not detector.is_model_loaded():
+            logger.error("Model not loaded, nothing to benchmark")
+            return 1
+
+        if 'detect' in args.suites:
+            results += run_detect_suite(detector, resolutions, args.batch_sizes, args.frames, args.iterations,
+                                        args.images)
+        if 'video' in args.suites:
+            results += run_video_suite(detector, resolutions, args.video_variants, work_dir, args.video_frames,
+                                       args.video)
+
+        report = {'environment': environment_info(detector), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Results written: {args.output}")
+
+    if args.baseline:
+        regressions = check_regressions(results, args.baseline, args.threshold)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            return 1
+        logger.info(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Inference backends: PyTorch (ultralytics), ONNX Runtime and OpenVINO
+"""
+
+import ast
+import copy
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from src.core.ops import PreprocessBuffers, candidates_from_raw, apply_nms, scale_boxes
+
+logger = logging.getLogger(__name__)
+
+EMPTY_DETECTIONS = np.zeros((0, 6), dtype=np.float32)
+
+
+def weights_hash(model_path, length=12):
+    """Short SHA-256 of the weight file, used to key exported artifacts"""
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+class PyTorchBackend:
+    """Ultralytics YOLO model, the reference implementation.
+
+    Inference runs the model's nn.Module directly, with the same reused
+    letterbox buffers and NumPy NMS as the exported backends. The module is
+    fused, put in eval mode and warmed up once at load. After that, forward
+    passes never change it, so sessions on other threads share it without a
+    lock. Only moving it to another device takes the lock.
+    """
+
+    name = 'pytorch'
+
+    def __init__(self, model_path, imgsz=640):
+        from ultralytics import YOLO
+
+        self.model = YOLO(str(model_path))
+        self.class_names = self.model.names
+        self.imgsz = imgsz
+        self.stride = int(self.model.model.stride.max())
+        self.timings = {}
+        self.buffers = PreprocessBuffers()
+        self.lock = threading.Lock()
+
+        self.model.model.fuse(verbose=False).eval()
+        self._forward(np.zeros((1, 3, imgsz, imgsz), dtype=np.float32))
+
+    def session(self):
+        """Backend for another thread, sharing the loaded module"""
+        session = copy.copy(self)
+        session.timings = {}
+        session.buffers = PreprocessBuffers()
+        return session
+
+    def predict(self, images, conf, iou, max_det=300, device=None):
+        """Per image (N, 6) float32 array of [x1, y1, x2, y2, conf, cls] in original image coordinates"""
+        start = time.perf_counter()
+        batch, transforms = self.preprocess(images)
+        preprocessed = time.perf_counter()
+        outputs = self._forward(batch, device)
+        forwarded = time.perf_counter()
+
+        predictions = [scale_boxes(apply_nms(candidates_from_raw(output, conf), iou, max_det), ratio, pad, shape)
+                       for output, (ratio, pad, shape) in zip(outputs, transforms)]
+
+        self.timings = {'preprocess': (preprocessed - start) * 1000,
+                        'forward': (forwarded - preprocessed) * 1000,
+                        'postprocess': (time.perf_counter() - forwarded) * 1000}
+        return predictions
+
+    def predict_candidates(self, images, conf, device=None):
+        """Per image (candidates, transform): pre-NMS (N, 6) rows above conf in letterbox coordinates"""
+        batch, transforms = self.preprocess(images)
+        outputs = self._forward(batch, device)
+        return [(candidates_from_raw(output, conf), transform) for output, transform in zip(outputs, transforms)]
+
+    def preprocess(self, images):
+        """Letterboxed NCHW float32 RGB batch plus per-image (ratio, pad, shape) transforms.
+
+        The batch is a reused buffer, overwritten by the next call.
+        """
+        return self.buffers.preprocess(images, self.imgsz, self.stride)
+
+    def _forward(self, batch, device=None):
+        """Raw (batch, 4 + nc, anchors) head output as a float32 array"""
+        import torch
+
+        if device is None:
+            device = 'cuda:0' if torch.cuda.is_available() else 'cpu'
+        model = self.model.model
+        if next(model.parameters()).device != torch.device(device):
+            with self.lock:
+                model.to(device)
+        with torch.inference_mode():
+            output = model(torch.from_numpy(batch).to(device))
+        output = output[0] if isinstance(output, (list, tuple)) else output
+        return output.float().cpu().numpy()
+
+
+class ExportedBackend:
+    """Exported model with its own letterbox preprocessing and NumPy NMS.
+
+    The export from the .pt weights happens once and is cached next to the
+    weights as <stem>-<weights hash>-<imgsz><suffix>, so retrained weights get
+    a fresh export and unchanged weights never re-export.
+    """
+
+    name = None
+    export_format = None
+    suffix = None
+
+    def __init__(self, model_path, imgsz=640):
+        self.imgsz = imgsz
+        self.stride = 32
+        self.timings = {}
+        self.buffers = PreprocessBuffers()
+        self.artifact_path = self.exported_path(model_path, imgsz)
+
+        if not self.artifact_path.exists():
+            self._export(Path(model_path))
+
+        self.class_names = {}
+        self._load(self.artifact_path)
+
+    @classmethod
+    def exported_path(cls, model_path, imgsz=640):
+        model_path = Path(model_path)
+        return model_path.with_name(f"{model_path.stem}-{weights_hash(model_path)}-{imgsz}{cls.suffix}")
+
+    def _export(self, model_path):
+        from ultralytics import YOLO
+
+        logger.info(f"Exporting {model_path} to {self.export_format} (imgsz={self.imgsz})")
+        exported = YOLO(str(model_path)).export(format=self.export_format, imgsz=self.imgsz, dynamic=True)
+        os.replace(Path(exported), self.artifact_path)
+        logger.info(f"Exported model cached: {self.artifact_path}")
+
+    def session(self):
+        """Backend for another thread, sharing the loaded model"""
+        session = copy.copy(self)
+        session.timings = {}
+        session.buffers = PreprocessBuffers()
+        return session
+
+    def _load(self, artifact_path):
+        raise NotImplementedError
+
+    def _forward(self, batch):
+        raise NotImplementedError
+
+    def predict(self, images, conf, iou, max_det=300, device=None):
+        """Per image (N, 6) float32 array of [x1, y1, x2, y2, conf, cls] in original image coordinates"""
+        start = time.perf_counter()
+        batch, transforms = self.preprocess(images)
+        preprocessed = time.perf_counter()
+        outputs = self._forward(batch)
+        forwarded = time.perf_counter()
+
+        predictions = [scale_boxes(apply_nms(candidates_from_raw(output, conf), iou, max_det), ratio, pad, shape)
+                       for output, (ratio, pad, shape) in zip(outputs, transforms)]
+
+        self.timings = {'preprocess': (preprocessed - start) * 1000,
+                        'forward': (forwarded - preprocessed) * 1000,
+                        'postprocess': (time.perf_counter() - forwarded) * 1000}
+        return predictions
+
+    def predict_candidates(self, images, conf, device=None):
+        """Per image (candidates, transform): pre-NMS (N, 6) rows above conf in letterbox coordinates"""
+        batch, transforms = self.preprocess(images)
+        outputs = self._forward(batch)
+        return [(candidates_from_raw(output, conf), transform) for output, transform in zip(outputs, transforms)]
+
+    def preprocess(self, images):
+        """Letterboxed NCHW float32 RGB batch plus per-image (ratio, pad, shape) transforms.
+
+        The batch is a reused buffer, overwritten by the next call.
+        """
+        return self.buffers.preprocess(images, self.imgsz, self.stride)
+
+
+class OnnxRuntimeBackend(ExportedBackend):
+
+    name = 'onnxruntime'
+    export_format = 'onnx'
+    suffix = '.onnx'
+
+    def _load(self, artifact_path):
+        import onnxruntime as ort
+
+        # InferenceSession.run is thread-safe, sessions share it
+        self.ort_session = ort.InferenceSession(str(artifact_path), providers=['CPUExecutionProvider'])
+        self.input_name = self.ort_session.get_inputs()[0].name
+
+        metadata = self.ort_session.get_modelmeta().custom_metadata_map
+        self.class_names = ast.literal_eval(metadata.get('names', '{}'))
+        self.stride = int(metadata.get('stride', 32))
+
+    def _forward(self, batch):
+        return self.ort_session.run(None, {self.input_name: batch})[0]
+
+
+class OnnxRuntimeInt8Backend(OnnxRuntimeBackend):
+    """Statically quantized ONNX model produced by src/quantize.py"""
+
+    name = 'onnxruntime-int8'
+    suffix = '-int8.onnx'
+
+    def _export(self, model_path):
+        raise FileNotFoundError(f"INT8 model not found: {self.artifact_path}, run 'python src/quantize.py' first")
+
+
+class OpenVINOBackend(ExportedBackend):
+
+    name = 'openvino'
+    export_format = 'openvino'
+    suffix = '_openvino_model'
+
+    def _load(self, artifact_path):
+        import openvino as ov
+
+        model_xml = next(artifact_path.glob('*.xml'))
+        self.compiled = ov.Core().compile_model(str(model_xml), 'CPU')
+        self.output = self.compiled.output(0)
+        self.request = self.compiled.create_infer_request()
+
+        metadata_path = artifact_path / 'metadata.yaml'
+        if metadata_path.exists():
+            with open(metadata_path, 'r') as f:
+                metadata = yaml.safe_load(f)
+            self.class_names = metadata.get('names', {})
+            self.stride = int(metadata.get('stride', 32))
+
+    def session(self):
+        # An infer request runs one inference at a time, each session gets its own
+        session = super().session()
+        session.request = self.compiled.create_infer_request()
+        return session
+
+    def _forward(self, batch):
+        # The input buffer stays untouched until the next preprocess, OpenVINO can read it without a copy
+        return self.request.infer(batch, share_inputs=True)[self.output]
+
+
+BACKENDS = {
+    PyTorchBackend.name: PyTorchBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OnnxRuntimeInt8Backend.name: OnnxRuntimeInt8Backend,
+    OpenVINOBackend.name: OpenVINOBackend,
+}
+
+
+def create_backend(name, model_path, imgsz=640):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_path, imgsz=imgsz)
@@ -0,0 +1,143 @@
+"""
+Per-frame raw candidate sidecar files for videos
+"""
+
+import json
+import shutil
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from src.core.detection import RawCandidates
+from src.core.ops import apply_nms
+
+MAGIC = b'SLRCAND1'
+_COUNT = struct.Struct('<I')
+
+
+def sidecar_path(video_path):
+    """Default sidecar location, next to the source video"""
+    video_path = Path(video_path)
+    return video_path.with_name(video_path.name + '.candidates')
+
+
+class CandidateSidecarWriter:
+    """Streams one RawCandidates record per frame after a JSON header.
+
+    Records are the float32 RawCandidates.to_array() rows prefixed with their
+    row count, so an hour of video is written without holding it in memory.
+    A frame without candidates (failed inference) is stored as zero rows.
+    """
+
+    def __init__(self, path, header):
+        self.path = Path(path)
+        self.frames = 0
+        self._file = open(self.path, 'wb')
+        encoded = json.dumps(header).encode('utf-8')
+        self._file.write(MAGIC + _COUNT.pack(len(encoded)) + encoded)
+
+    @classmethod
+    def for_detector(cls, path, detector, source, width, height):
+        return cls(path, {
+            'source': Path(source).name,
+            'size': [width, height],
+            'model': detector.model_key or str(detector.model_path),
+            'floor': detector.config.get('model', {}).get('candidate_confidence', 0.1),
+            'class_names': {str(k): v for k, v in detector.class_names.items()},
+        })
+
+    def write(self, candidates):
+        array = candidates.to_array() if candidates is not None else np.zeros((0, 6), dtype=np.float32)
+        self._file.write(_COUNT.pack(len(array)))
+        self._file.write(np.ascontiguousarray(array, dtype=np.float32).tobytes())
+        self.frames += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CandidateSidecarReader:
+    """Reads a sidecar back, frames() yields RawCandidates (None for frames stored empty) in frame order"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"Not a candidate sidecar: {self.path}")
+        (length,) = _COUNT.unpack(self._file.read(_COUNT.size))
+        self.header = json.loads(self._file.read(length).decode('utf-8'))
+        self.class_names = {int(k): v for k, v in self.header.get('class_names', {}).items()}
+
+    def frames(self):
+        while True:
+            count = self._file.read(_COUNT.size)
+            if len(count) < _COUNT.size:
+                return
+            (rows,) = _COUNT.unpack(count)
+            if rows == 0:
+                yield None
+                continue
+            array = np.frombuffer(self._file.read(rows * 24), dtype=np.float32).reshape(rows, 6)
+            yield RawCandidates.from_array(array)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def concat_sidecars(paths, output_path):
+    """Join the sidecars of consecutive frame ranges into one, keeping the first header"""
+    with open(output_path, 'wb') as out:
+        for index, path in enumerate(paths):
+            with CandidateSidecarReader(path) as reader:
+                if index == 0:
+                    encoded = json.dumps(reader.header).encode('utf-8')
+                    out.write(MAGIC + _COUNT.pack(len(encoded)) + encoded)
+                shutil.copyfileobj(reader._file, out)
+
+
+def sweep_thresholds(path, confidences, ious, max_det=300):
+    """Detection counts for every (conf, iou) pair in one pass over the sidecar.
+
+    Greedy NMS only lets higher-scoring boxes suppress a box, so the boxes kept
+    at a higher confidence are exactly those kept at the lowest one scoring
+    above it: one NMS per IoU and frame serves the whole confidence axis.
+    Returns {(conf, iou): {'detections': n, 'frames_with_detections': n}} and
+    the number of frames read. Confidences below the recorded floor are skipped.
+    """
+    with CandidateSidecarReader(path) as reader:
+        floor = reader.header.get('floor', 0.0)
+        confidences = sorted(conf for conf in confidences if conf >= floor)
+        counts = {(conf, iou): {'detections': 0, 'frames_with_detections': 0}
+                  for conf in confidences for iou in ious}
+
+        frame_count = 0
+        for candidates in reader.frames():
+            frame_count += 1
+            if candidates is None or not confidences:
+                continue
+            rows = candidates.rows[candidates.rows[:, 4] > confidences[0]]
+            if len(rows) == 0:
+                continue
+            for iou in ious:
+                scores = apply_nms(rows, iou, max_det=len(rows))[:, 4]
+                for conf in confidences:
+                    kept = min(max_det, int((scores > conf).sum()))
+                    counts[(conf, iou)]['detections'] += kept
+                    counts[(conf, iou)]['frames_with_detections'] += kept > 0
+
+    return counts, frame_count
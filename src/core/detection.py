@@ -0,0 +1,133 @@
+"""
+Compact detection result type
+"""
+
+import numpy as np
+
+
+class Detection:
+    """One detected sign.
+
+    Attributes are slots instead of a per-detection dict; item access
+    (detection['bbox'], detection.get('speed_limit')) is kept so code written
+    against the old dict results keeps working.
+    """
+
+    __slots__ = ('bbox', 'confidence', 'class_id', 'class_name', 'speed_limit', 'track_id', 'propagated')
+
+    FIELDS = ('bbox', 'confidence', 'class_id', 'class_name', 'speed_limit')
+    TRACK_FIELDS = ('track_id', 'propagated')
+
+    def __init__(self, bbox, confidence, class_id, class_name, speed_limit=None, track_id=None, propagated=None):
+        self.bbox = bbox
+        self.confidence = confidence
+        self.class_id = class_id
+        self.class_name = class_name
+        self.speed_limit = speed_limit
+        self.track_id = track_id
+        self.propagated = propagated
+
+    def keys(self):
+        """Field names, track fields only once the tracker has set them"""
+        if self.track_id is None:
+            return self.FIELDS
+        return self.FIELDS + self.TRACK_FIELDS
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (Detection, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Detection({', '.join(f'{key}={self[key]!r}' for key in self.keys())})"
+
+    def get(self, key, default=None):
+        return self[key] if key in self.keys() else default
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def copy(self):
+        return Detection(self.bbox, self.confidence, self.class_id, self.class_name, self.speed_limit,
+                         self.track_id, self.propagated)
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+
+def speed_limit_table(class_names):
+    """Class id -> (class_name, speed_limit) for every model class, speed limit None for non-numeric names"""
+    table = {}
+    for class_id, class_name in class_names.items():
+        try:
+            speed_limit = int(class_name)
+        except (TypeError, ValueError):
+            speed_limit = None
+        table[int(class_id)] = (class_name, speed_limit)
+    return table
+
+
+def detections_from_array(prediction, labels):
+    """(N, 6) [x1, y1, x2, y2, conf, cls] array -> list of Detection, converted in bulk"""
+    if len(prediction) == 0:
+        return []
+
+    boxes = prediction[:, :4].astype(int).tolist()
+    confidences = prediction[:, 4].tolist()
+    class_ids = prediction[:, 5].astype(int).tolist()
+
+    detections = []
+    for box, confidence, class_id in zip(boxes, confidences, class_ids):
+        class_name, speed_limit = labels.get(class_id) or (f'class_{class_id}', None)
+        detections.append(Detection(tuple(box), confidence, class_id, class_name, speed_limit))
+    return detections
+
+
+class RawCandidates:
+    """Pre-NMS candidates of one image, kept so thresholds can change without inferring again.
+
+    rows are (N, 6) [x1, y1, x2, y2, conf, cls] in letterbox coordinates with
+    conf above floor, transform is the (ratio, (pad_x, pad_y), (height, width))
+    letterbox mapping back to the image.
+    """
+
+    __slots__ = ('rows', 'transform', 'floor')
+
+    def __init__(self, rows, transform, floor):
+        self.rows = rows
+        self.transform = transform
+        self.floor = floor
+
+    def to_array(self):
+        """Single (N + 1, 6) float32 array, the first row holding the letterbox size, pad, shape and floor"""
+        ratio, (pad_x, pad_y), (height, width) = self.transform
+        # The input size is stored rather than the float ratio so the transform round-trips exactly
+        size = round(ratio * max(height, width))
+        header = np.array([[size, pad_x, pad_y, height, width, self.floor]], dtype=np.float32)
+        return np.concatenate([header, self.rows.astype(np.float32)])
+
+    @classmethod
+    def from_array(cls, array):
+        size, pad_x, pad_y, height, width, floor = array[0].tolist()
+        height, width = int(height), int(width)
+        ratio = min(size / height, size / width)
+        return cls(array[1:], (ratio, (int(pad_x), int(pad_y)), (height, width)), round(floor, 6))
@@ -0,0 +1,135 @@
+"""
+Persistent SQLite cache of raw detections
+"""
+
+import hashlib
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def image_hash(image):
+    """Content hash of a decoded image, independent of file name and container"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(image.shape).encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """Maps (image content, model, inference parameters) to the (N, 6) detection array.
+
+    Only the compact float32 rows are stored, never rendered images, so a
+    cached entry costs 24 bytes per detection. The database runs in WAL mode
+    and each instance opens its own connection, so detector sessions on
+    other threads and the video pipeline processes can share the same file.
+
+    Entries not used for max_age_days are evicted, and beyond max_entries
+    the least recently used ones go first. Eviction runs when the database
+    is opened and every evict_interval stored entries.
+    """
+
+    def __init__(self, path, max_entries=500000, max_age_days=30, evict_interval=1000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._stored_since_eviction = 0
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS detections ("
+                "content TEXT NOT NULL, model TEXT NOT NULL, params TEXT NOT NULL, rows BLOB NOT NULL, "
+                "used REAL NOT NULL DEFAULT 0, PRIMARY KEY (content, model, params)) WITHOUT ROWID")
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(detections)")]
+            if 'used' not in columns:
+                # Databases written before eviction existed, their entries count as used now
+                with self._connection:
+                    self._connection.execute("ALTER TABLE detections ADD COLUMN used REAL NOT NULL DEFAULT 0")
+                    self._connection.execute("UPDATE detections SET used = ?", (time.time(),))
+            self._connection.execute("CREATE INDEX IF NOT EXISTS detections_used ON detections (used)")
+            self.evict()
+        return self._connection
+
+    def get_many(self, contents, model, params):
+        """{content hash: (N, 6) array} for the cached ones among contents"""
+        found = {}
+        unique = list(dict.fromkeys(contents))
+        # SQLite caps the number of bound parameters per statement
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            rows = self._connect().execute(
+                f"SELECT content, rows FROM detections WHERE model = ? AND params = ? "
+                f"AND content IN ({', '.join('?' * len(chunk))})", [model, params] + chunk)
+            for content, blob in rows:
+                found[content] = np.frombuffer(blob, dtype=np.float32).reshape(-1, 6).copy()
+
+        if found:
+            connection = self._connect()
+            with connection:
+                now = time.time()
+                connection.executemany("UPDATE detections SET used = ? WHERE content = ? AND model = ? AND params = ?",
+                                       [(now, content, model, params) for content in found])
+        self.hits += sum(1 for content in contents if content in found)
+        self.misses += sum(1 for content in contents if content not in found)
+        return found
+
+    def put_many(self, entries, model, params):
+        """Store {content hash: (N, 6) array}"""
+        connection = self._connect()
+        with connection:
+            now = time.time()
+            connection.executemany(
+                "INSERT OR REPLACE INTO detections (content, model, params, rows, used) VALUES (?, ?, ?, ?, ?)",
+                [(content, model, params, np.ascontiguousarray(rows, dtype=np.float32).tobytes(), now)
+                 for content, rows in entries.items()])
+
+        self._stored_since_eviction += len(entries)
+        if self._stored_since_eviction >= self.evict_interval:
+            self.evict()
+
+    def evict(self):
+        """Drop entries unused for max_age_days, then the least recently used ones beyond max_entries"""
+        connection = self._connect()
+        self._stored_since_eviction = 0
+        with connection:
+            removed = 0
+            if self.max_age_days:
+                removed += connection.execute("DELETE FROM detections WHERE used < ?",
+                                              (time.time() - self.max_age_days * 86400,)).rowcount
+            if self.max_entries:
+                excess = connection.execute("SELECT COUNT(*) FROM detections").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    removed += connection.execute(
+                        "DELETE FROM detections WHERE (content, model, params) IN "
+                        "(SELECT content, model, params FROM detections ORDER BY used LIMIT ?)", (excess,)).rowcount
+        if removed:
+            self.evicted += removed
+            logger.info(f"Detection cache: evicted {removed} entries")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+
+    def clear(self):
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM detections")
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
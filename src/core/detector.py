@@ -2,28 +2,46 @@
 Speed Sign Detector using YOLO
 """
 
-import cv2
+import copy
+import math
+import time
 import yaml
 import logging
 
+import cv2
+import numpy as np
+
 from pathlib import Path
-from ultralytics import YOLO
+
+from src.core.backends import create_backend, weights_hash
+from src.core.detection import RawCandidates, detections_from_array, speed_limit_table
+from src.core.detection_cache import DetectionCache, image_hash
+from src.core.ops import apply_nms, filter_candidates
+from src.core.renderer import DetectionRenderer
 
 logger = logging.getLogger(__name__)
 
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
 
 class SpeedSignDetector:
     """Detection class using trained YOLO model"""
 
-    def __init__(self, model_path=None, config_path='config/settings.yaml'):
-        self.model = None
+    def __init__(self, model_path=None, config_path='config/settings.yaml', config=None, load_model=True):
+        self.backend = None
         self.class_names = {}
-        self.config = self._load_config(config_path)
+        self.labels = {}
+        self.renderer = DetectionRenderer()
+        self.detection_cache = None
+        self.model_key = None
+        self.timings = {}
+        self.config = config if config is not None else self._load_config(config_path)
 
         if model_path is None:
             model_path = self.config.get('model', {}).get('yolo_model', 'models/speed_limit_recog/weights/best.pt')
         self.model_path = Path(model_path)
-        self._load_model()
+        if load_model:
+            self._load_model()
 
     @staticmethod
     def _load_config(config_path):
@@ -42,106 +60,328 @@ class SpeedSignDetector:
     def _load_model(self):
         try:
             if self.model_path.exists():
-                self.model = YOLO(str(self.model_path))
-                self.class_names = self.model.names
-                logger.info(f"Model loaded: {self.model_path}")
+                backend = self.config.get('model', {}).get('backend', 'pytorch')
+                imgsz = self.config.get('processing', {}).get('input_size', 640)
+                self.backend = create_backend(backend, self.model_path, imgsz=imgsz)
+                self.class_names = self.backend.class_names
+                self.labels = speed_limit_table(self.class_names)
+                self.model_key = f"{weights_hash(self.model_path)}:{backend}:{imgsz}"
+                logger.info(f"Model loaded: {self.model_path} ({backend} backend)")
+                self._init_detection_cache()
             else:
                 logger.error(f"Model not found: {self.model_path}")
-                self.model = None
+                self.backend = None
         except Exception as e:
             logger.error(f"Model load failed: {e}")
-            self.model = None
+            self.backend = None
 
-    def detect(self, image, conf_override=None, iou_override=None):
-        if self.model is None:
-            return image, []
+    def _init_detection_cache(self):
+        processing = self.config.get('processing', {})
+        if not processing.get('detection_cache', False):
+            return
+        # Relative paths are taken from the project root, the GUI and CLI scripts may start from any directory
+        path = Path(processing.get('detection_cache_path', 'cache/detections.sqlite'))
+        if not path.is_absolute():
+            path = PROJECT_ROOT / path
+        self.detection_cache = DetectionCache(path,
+                                              max_entries=processing.get('detection_cache_max_entries', 500000),
+                                              max_age_days=processing.get('detection_cache_max_age_days', 30))
+        logger.info(f"Detection cache: {self.detection_cache.path}")
 
-        try:
-            conf = conf_override if conf_override is not None else self.config.get('model', {}).get(
-                'confidence_threshold', 0.5)
-            iou = iou_override if iou_override is not None else self.config.get('model', {}).get('iou_threshold', 0.45)
+    def session(self, conf_override=None, iou_override=None):
+        """Detector for one job on one thread, sharing this one's loaded weights.
+
+        The config is snapshotted (with the overrides applied), so parameter
+        updates on either side never reach a running job. Timings, label
+        sprites and the detection cache connection are the session's own, and
+        the backend session is safe to use alongside the others.
+        """
+        session = copy.copy(self)
+        session.config = copy.deepcopy(self.config)
+        session.config.setdefault('model', {})
+        session.update_parameters(conf_override, iou_override)
+        session.timings = {}
+        session.renderer = DetectionRenderer()
+        if self.detection_cache is not None:
+            session.detection_cache = DetectionCache(self.detection_cache.path, self.detection_cache.max_entries,
+                                                     self.detection_cache.max_age_days)
+        if self.backend is not None:
+            session.backend = self.backend.session()
+        return session
 
-            results = self.model(image, conf=conf, iou=iou, verbose=False)
+    def without_cache(self):
+        """This detector (same config, weights and backend) bypassing the detection cache.
 
-            detections = []
-            annotated = image.copy()
+        Returns self when there is no cache. For video frames, which never
+        repeat, hashing and storing every frame would only cost time and disk.
+        """
+        if self.detection_cache is None:
+            return self
+        uncached = copy.copy(self)
+        uncached.detection_cache = None
+        return uncached
 
-            if len(results) > 0 and results[0].boxes is not None:
-                boxes = results[0].boxes
+    def detect(self, image, conf_override=None, iou_override=None, render=True, in_place=False):
+        return self.detect_batch([image], conf_override, iou_override, render, in_place)[0]
 
-                for box in boxes:
-                    confidence = float(box.conf[0])
-                    cls = int(box.cls[0])
-                    xyxy = box.xyxy[0].cpu().numpy()
-                    x1, y1, x2, y2 = map(int, xyxy)
+    def detect_batch(self, images, conf_override=None, iou_override=None, render=True, in_place=False):
+        """Detect on several images in one forward pass, results in input order.
 
-                    class_name = self.class_names.get(cls, f'class_{cls}')
-                    speed_limit = self._extract_speed_limit(class_name)
+        Returns (annotated, detections) per image. annotated is None when render
+        is False, and the input image itself, drawn on, when in_place is True.
+        """
+        images = list(images)
+        if self.backend is None or not images:
+            return [(image if render else None, []) for image in images]
 
-                    detection = {
-                        'bbox': (x1, y1, x2, y2),
-                        'confidence': confidence,
-                        'class_id': cls,
-                        'class_name': class_name,
-                        'speed_limit': speed_limit
-                    }
-                    detections.append(detection)
-                    annotated = self._draw_detection(annotated, detection)
+        try:
+            conf, iou, max_det = self.inference_parameters(conf_override, iou_override)
+            predictions = self._predict(images, conf, iou, max_det)
+
+            results = [detections_from_array(prediction, self.labels) for prediction in predictions]
+            if not render:
+                self.timings['draw'] = 0.0
+                return [(None, detections) for detections in results]
 
-            return annotated, detections
+            start = time.perf_counter()
+            results = [(self.annotate(image, detections, in_place), detections)
+                       for image, detections in zip(images, results)]
+            self.timings['draw'] = (time.perf_counter() - start) * 1000
+            return results
 
         except Exception as e:
             logger.error(f"Detection failed: {e}")
-            return image, []
+            return [(image if render else None, []) for image in images]
 
-    @staticmethod
-    def _extract_speed_limit(class_name):
-        """Extract speed limit from class name"""
+    def detect_regions(self, image, regions, conf_override=None, iou_override=None, render=True, in_place=False):
+        """(annotated, detections) inferring only the (x1, y1, x2, y2) pixel regions of the image.
+
+        Each crop is letterboxed to a stride-aligned rectangle at the scale
+        the whole frame would be inferred at, so signs keep the size the
+        model sees on full frames. Crops of similar shape are padded to a
+        common rectangle and inferred in one batch. Crops bypass the
+        detection cache, they never repeat. Boxes are mapped back to the
+        frame and deduplicated across overlapping regions with NMS.
+        """
+        if self.backend is None or not regions:
+            return image if render else None, []
+
+        conf, iou, max_det = self.inference_parameters(conf_override, iou_override)
+        height, width = image.shape[:2]
+        full_size = self.backend.imgsz
+        stride = getattr(self.backend, 'stride', 32)
+        scale = full_size / max(height, width)
+        crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+
+        timings = {}
+        predictions = []
         try:
-            return int(class_name)
-        except:
+            for group in self._region_groups([crop.shape[:2] for crop in crops]):
+                crop_h = max(crops[i].shape[0] for i in group)
+                crop_w = max(crops[i].shape[1] for i in group)
+                size = math.ceil(max(crop_h, crop_w) * scale / stride) * stride
+                self.set_input_size(min(full_size, max(stride, size)))
+
+                batch = [cv2.copyMakeBorder(crops[i], 0, crop_h - crops[i].shape[0], 0, crop_w - crops[i].shape[1],
+                                            cv2.BORDER_CONSTANT, value=(114, 114, 114))
+                         if crops[i].shape[:2] != (crop_h, crop_w) else crops[i] for i in group]
+                for i, prediction in zip(group, self._predict(batch, conf, iou, max_det, cached=False)):
+                    x1, y1, x2, y2 = regions[i]
+                    # Boxes reaching into the padding end at the crop border
+                    prediction[:, [0, 2]] = prediction[:, [0, 2]].clip(0, x2 - x1) + x1
+                    prediction[:, [1, 3]] = prediction[:, [1, 3]].clip(0, y2 - y1) + y1
+                    predictions.append(prediction)
+                for stage, value in self.timings.items():
+                    timings[stage] = timings.get(stage, 0.0) + value
+        except Exception as e:
+            logger.error(f"Region detection failed: {e}")
+            return image if render else None, []
+        finally:
+            self.set_input_size(full_size)
+
+        prediction = predictions[0] if len(predictions) == 1 else apply_nms(np.concatenate(predictions), iou, max_det)
+        detections = detections_from_array(prediction, self.labels)
+        self.timings = timings
+        if not render:
+            return None, detections
+        return self.annotate(image, detections, in_place), detections
+
+    @staticmethod
+    def _region_groups(shapes, max_overhead=1.25):
+        """Indices of crops to infer together, largest first. A crop joins a group when padding all of them to the
+        common rectangle adds at most max_overhead times their pixels."""
+        groups = []
+        for i in sorted(range(len(shapes)), key=lambda i: shapes[i][0] * shapes[i][1], reverse=True):
+            for group in groups:
+                members = group + [i]
+                common = max(shapes[j][0] for j in members) * max(shapes[j][1] for j in members)
+                if common * len(members) <= max_overhead * sum(shapes[j][0] * shapes[j][1] for j in members):
+                    group.append(i)
+                    break
+            else:
+                groups.append([i])
+        return groups
+
+    def lookup(self, image, conf_override=None, iou_override=None, render=True):
+        """(annotated, detections) from the detection cache without inferring, None when not cached"""
+        if self.detection_cache is None:
             return None
 
-    def update_parameters(self, conf=None, iou=None):
-        if conf is not None:
-            self.config['model']['confidence_threshold'] = conf
-        if iou is not None:
-            self.config['model']['iou_threshold'] = iou
+        conf, iou, max_det = self.inference_parameters(conf_override, iou_override)
+        content = image_hash(image)
+        prediction = self.detection_cache.get_many([content], self.model_key, self._cache_params(conf, iou, max_det))
+        if content not in prediction:
+            return None
+
+        detections = detections_from_array(prediction[content], self.labels)
+        return self.annotate(image, detections) if render else None, detections
+
+    def inference_parameters(self, conf_override=None, iou_override=None):
+        """(conf, iou, max_det) from the overrides or the config"""
+        model = self.config.get('model', {})
+        conf = conf_override if conf_override is not None else model.get('confidence_threshold', 0.5)
+        iou = iou_override if iou_override is not None else model.get('iou_threshold', 0.45)
+        return conf, iou, model.get('max_det', 300)
 
     @staticmethod
-    def _draw_detection(image, detection):
-        """Draw detection box and label with confidence-based color"""
-        x1, y1, x2, y2 = detection['bbox']
-        conf = detection['confidence']
-        speed = detection['speed_limit']
+    def _cache_params(conf, iou, max_det):
+        return f"conf={conf:.4f},iou={iou:.4f},max_det={max_det}"
 
-        # Color based on confidence
-        if conf >= 0.8:
-            color = (0, 255, 0)  # Green (high confidence)
-        elif conf >= 0.6:
-            color = (0, 165, 255)  # Orange (medium)
-        else:
-            color = (0, 100, 255)  # Red (low)
+    def _predict(self, images, conf, iou, max_det, cached=True):
+        """Backend predictions, served from the detection cache (unless cached is False) where the same image was
+        seen before"""
+        self.timings = {'preprocess': 0.0, 'forward': 0.0, 'postprocess': 0.0}
 
-        # Draw rectangle
-        cv2.rectangle(image, (x1, y1), (x2, y2), color, 3)
+        def infer(batch):
+            predictions = self.backend.predict(batch, conf, iou, max_det=max_det, device=self._get_device())
+            self.timings = dict(self.backend.timings)
+            return predictions
 
-        # Label
-        label = f"{speed} km/h ({conf:.2f})" if speed else f"{detection['class_name']} ({conf:.2f})"
+        if self.detection_cache is None or not cached:
+            return infer(images)
+        return self._cached(images, self._cache_params(conf, iou, max_det), infer)
 
-        font_scale = 0.8
-        thickness = 2
-        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+    def _cached(self, images, params, compute):
+        """compute(images) -> arrays, run only on the images without a detection cache entry for params"""
+        start = time.perf_counter()
+        contents = [image_hash(image) for image in images]
+        found = self.detection_cache.get_many(contents, self.model_key, params)
+        missing = [i for i, content in enumerate(contents) if content not in found]
+        cache_ms = (time.perf_counter() - start) * 1000
 
-        # Draw label background
-        cv2.rectangle(image, (x1, y1 - h - 10), (x1 + w, y1), color, -1)
+        if missing:
+            arrays = compute([images[i] for i in missing])
 
-        # Draw label text
-        cv2.putText(image, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX,
-                    font_scale, (255, 255, 255), thickness)
+            start = time.perf_counter()
+            fresh = {contents[i]: array for i, array in zip(missing, arrays)}
+            self.detection_cache.put_many(fresh, self.model_key, params)
+            found.update(fresh)
+            cache_ms += (time.perf_counter() - start) * 1000
+
+        self.timings['cache'] = cache_ms
+        return [found[content] for content in contents]
+
+    def detect_candidates(self, images, cached_only=False):
+        """Raw pre-NMS candidates per image, collected at model.candidate_confidence.
+
+        Any confidence at or above that floor and any IoU can then be applied
+        with refilter() without another forward pass. Entries are None for
+        images that failed, or that are not cached when cached_only is set.
+        """
+        images = list(images)
+        if self.backend is None or not images:
+            return [None for _ in images]
+
+        floor = self.config.get('model', {}).get('candidate_confidence', 0.1)
+        params = f"candidates>{floor:.4f}"
+
+        if cached_only:
+            if self.detection_cache is None:
+                return [None for _ in images]
+            contents = [image_hash(image) for image in images]
+            found = self.detection_cache.get_many(contents, self.model_key, params)
+            return [RawCandidates.from_array(found[content]) if content in found else None for content in contents]
+
+        def infer(batch):
+            return [RawCandidates(rows, transform, floor).to_array()
+                    for rows, transform in self.backend.predict_candidates(batch, floor, device=self._get_device())]
+
+        try:
+            if self.detection_cache is None:
+                arrays = infer(images)
+            else:
+                arrays = self._cached(images, params, infer)
+            return [RawCandidates.from_array(array) for array in arrays]
+        except Exception as e:
+            logger.error(f"Candidate detection failed: {e}")
+            return [None for _ in images]
+
+    def refilter(self, image, candidates, conf_override=None, iou_override=None, render=True, in_place=False):
+        """(annotated, detections) from stored candidates at the current thresholds, no inference.
+
+        Returns None when the confidence is below the floor the candidates were
+        collected at, detect_candidates() has to run again then.
+        """
+        conf, iou, max_det = self.inference_parameters(conf_override, iou_override)
+        if conf < candidates.floor:
+            return None
+
+        prediction = filter_candidates(candidates.rows, candidates.transform, conf, iou, max_det)
+        detections = detections_from_array(prediction, self.labels)
+        return self.annotate(image, detections, in_place) if render else None, detections
+
+    def iter_detect_batch(self, images, batch_size=None, conf_override=None, iou_override=None, render=True,
+                          in_place=False):
+        """Yield (annotated, detections) for each image, inferring in chunks of batch_size"""
+        if batch_size is None:
+            batch_size = self.get_batch_size()
+
+        batch = []
+        for image in images:
+            batch.append(image)
+            if len(batch) >= batch_size:
+                yield from self.detect_batch(batch, conf_override, iou_override, render, in_place)
+                batch = []
+
+        if batch:
+            yield from self.detect_batch(batch, conf_override, iou_override, render, in_place)
+
+    def get_batch_size(self):
+        """Frames per forward pass from processing.batch_size, 1 unless batch_processing is on"""
+        processing = self.config.get('processing', {})
+        if not processing.get('batch_processing', False):
+            return 1
+        return max(1, int(processing.get('batch_size', 1)))
+
+    def input_size(self):
+        """Inference resolution the backend letterboxes to"""
+        if self.backend is None:
+            return self.config.get('processing', {}).get('input_size', 640)
+        return self.backend.imgsz
+
+    def set_input_size(self, size):
+        """Change the inference resolution at runtime, exported models are exported with dynamic input shapes"""
+        if self.backend is None or self.backend.imgsz == size:
+            return
+        self.backend.imgsz = size
+        # Detections at another resolution are cached separately
+        self.model_key = f"{self.model_key.rsplit(':', 1)[0]}:{size}"
+
+    def _get_device(self):
+        if self.config.get('processing', {}).get('use_gpu', True):
+            return None
+        return 'cpu'
+
+    def update_parameters(self, conf=None, iou=None):
+        if conf is not None:
+            self.config['model']['confidence_threshold'] = conf
+        if iou is not None:
+            self.config['model']['iou_threshold'] = iou
 
-        return image
+    def annotate(self, image, detections, in_place=False):
+        """Draw detections on a copy of the image, or on the image itself when in_place"""
+        return self.renderer.draw(image, detections, in_place)
 
     def is_model_loaded(self):
         """Check if model is loaded"""
-        return self.model is not None
+        return self.backend is not None
@@ -0,0 +1,122 @@
+"""
+Threaded decode / encode stages around the inference loop
+"""
+
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class ThreadedFramePipeline:
+    """Decode and encode threads joined to the inference stage by bounded queues.
+
+    The caller runs inference: it pulls frames from frames() and pushes results
+    with write(). Full queues block the faster side (backpressure), single
+    producer/consumer per queue keeps frame order, and any stage error stops
+    all stages and is re-raised in the caller.
+    """
+
+    def __init__(self, cap, writer, queue_size=8):
+        self.cap = cap
+        self.writer = writer
+        self.queue_size = queue_size
+        self.decode_queue = queue.Queue(maxsize=queue_size)
+        self.encode_queue = queue.Queue(maxsize=queue_size)
+        self.peak_depths = {'decode': 0, 'encode': 0}
+        self.frames_decoded = 0
+        self.frames_encoded = 0
+        self._stop_event = threading.Event()
+        self._error = None
+        self._decode_thread = threading.Thread(target=self._decode_loop, name="video-decode", daemon=True)
+        self._encode_thread = threading.Thread(target=self._encode_loop, name="video-encode", daemon=True)
+
+    def start(self):
+        self._decode_thread.start()
+        self._encode_thread.start()
+
+    def frames(self):
+        """Decoded frames in order, ends when the video is exhausted or the pipeline stops"""
+        while True:
+            item = self._get(self.decode_queue)
+            if item is _END or item is None:
+                break
+            yield item
+        self._raise_error()
+
+    def write(self, frame):
+        self._raise_error()
+        if not self._put(self.encode_queue, frame, 'encode'):
+            self._raise_error()
+            raise RuntimeError("Pipeline stopped before frame could be encoded")
+
+    def finish(self):
+        """Flush remaining frames through the encoder and wait for it"""
+        self._put(self.encode_queue, _END, 'encode')
+        self._encode_thread.join()
+        self._raise_error()
+
+    def stop(self):
+        self._stop_event.set()
+        for thread in (self._decode_thread, self._encode_thread):
+            if thread.is_alive():
+                thread.join()
+
+    def queue_depths(self):
+        return {'decode': self.decode_queue.qsize(), 'encode': self.encode_queue.qsize()}
+
+    def _decode_loop(self):
+        try:
+            while not self._stop_event.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                if not self._put(self.decode_queue, frame, 'decode'):
+                    return
+                self.frames_decoded += 1
+        except Exception as e:
+            self._fail(e, "decode")
+        finally:
+            self._put(self.decode_queue, _END, 'decode')
+
+    def _encode_loop(self):
+        try:
+            while True:
+                item = self._get(self.encode_queue)
+                if item is _END or item is None:
+                    break
+                self.writer.write(item)
+                self.frames_encoded += 1
+        except Exception as e:
+            self._fail(e, "encode")
+
+    def _put(self, q, item, name):
+        while not self._stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                self.peak_depths[name] = max(self.peak_depths[name], q.qsize())
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _fail(self, error, stage):
+        logger.error(f"Pipeline {stage} stage failed: {error}")
+        if self._error is None:
+            self._error = error
+        self._stop_event.set()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
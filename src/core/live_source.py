@@ -0,0 +1,135 @@
+"""
+Live sources (camera, stream URL, named pipe) read on their own thread, keeping only the freshest frame
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def open_live_source(source, replay=True):
+    """(cap, pace_fps) for a camera index, stream URL, named pipe or video file.
+
+    A regular file stands in for a live source: with replay its frames are
+    released at the native FPS (pace_fps), as a camera would deliver them.
+    pace_fps is None for real live sources, which set their own pace.
+    """
+    source = str(source)
+    if source.isdigit():
+        cap = cv2.VideoCapture(int(source))
+    else:
+        cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        return cap, None
+
+    # Frames queued inside the capture backend are stale by the time they are read
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    pace_fps = None
+    if replay and Path(source).is_file():
+        pace_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    return cap, pace_fps
+
+
+class LatestFrameGrabber:
+    """Reads a capture continuously on a thread and holds only the newest frame.
+
+    latest() hands out the freshest frame not taken yet, each stamped with the
+    perf_counter time it was captured. A frame replaced before anyone took it
+    is counted as dropped, so a slow consumer skips frames instead of falling
+    behind the source.
+    """
+
+    def __init__(self, cap, pace_fps=None):
+        self.cap = cap
+        self.pace_fps = pace_fps
+        self.captured = 0
+        self.dropped = 0
+        self.finished = False
+
+        self._condition = threading.Condition()
+        self._frame = None
+        self._captured_at = None
+        self._seq = -1
+        self._taken = -1
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='live-capture', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            while not self._stop_event.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                if self.pace_fps:
+                    # Replayed files: release each frame at its presentation time
+                    delay = start + self.captured / self.pace_fps - time.perf_counter()
+                    if delay > 0 and self._stop_event.wait(delay):
+                        break
+
+                with self._condition:
+                    if self._seq > self._taken:
+                        self.dropped += 1
+                    self._frame = frame
+                    self._captured_at = time.perf_counter()
+                    self._seq = self.captured
+                    self.captured += 1
+                    self._condition.notify_all()
+        except Exception as e:
+            logger.error(f"Live capture failed: {e}")
+        finally:
+            with self._condition:
+                self.finished = True
+                self._condition.notify_all()
+
+    def latest(self, timeout=None):
+        """(seq, captured_at, frame) of the newest untaken frame, None when the source ended or timeout passed"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > self._taken or self.finished, timeout)
+            if self._seq <= self._taken:
+                return None
+            self._taken = self._seq
+            frame, self._frame = self._frame, None
+            return self._seq, self._captured_at, frame
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.cap.release()
+
+
+class LatencyStats:
+    """Capture-to-result latencies of the last window frames, measured against the frame budget of fps_target"""
+
+    def __init__(self, fps_target, window=10000):
+        self.fps_target = fps_target
+        self.budget = 1.0 / fps_target if fps_target else None
+        self.latencies = deque(maxlen=window)
+
+    def add(self, latency):
+        self.latencies.append(latency)
+
+    def summary(self):
+        """Percentiles and budget overruns in milliseconds, empty before the first frame"""
+        if not self.latencies:
+            return {}
+        values = np.fromiter(self.latencies, dtype=np.float64, count=len(self.latencies)) * 1000
+        p50, p90, p99 = np.percentile(values, (50, 90, 99))
+        summary = {'p50_ms': float(p50), 'p90_ms': float(p90), 'p99_ms': float(p99), 'max_ms': float(values.max())}
+        if self.budget is not None:
+            summary['budget_ms'] = self.budget * 1000
+            summary['over_budget'] = float(np.mean(values > self.budget * 1000))
+        return summary
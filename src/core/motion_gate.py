@@ -0,0 +1,73 @@
+"""
+Scene-change gating to skip inference on near-identical frames
+"""
+
+import logging
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGatedDetector:
+    """Reuses the last detections while frames barely differ from the last inferred one.
+
+    Frames are compared as small grayscale thumbnails against the frame the
+    detector last ran on, so slow drift still accumulates into a re-detect.
+    Exposes detect()/annotate()/config so it can stand in for the detector.
+    """
+
+    def __init__(self, detector, threshold=2.0, max_skip=30, downscale_width=64):
+        self.detector = detector
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.downscale_width = downscale_width
+        self.reference = None
+        self.last_detections = []
+        self.consecutive_skips = 0
+        self.inference_count = 0
+        self.skipped_count = 0
+
+    @classmethod
+    def from_config(cls, detector):
+        processing = detector.config.get('processing', {})
+        return cls(detector,
+                   threshold=processing.get('motion_threshold', 2.0),
+                   max_skip=processing.get('motion_max_skip', 30),
+                   downscale_width=processing.get('motion_downscale_width', 64))
+
+    @property
+    def config(self):
+        return self.detector.config
+
+    def detect(self, image, render=True, in_place=False):
+        thumbnail = self._thumbnail(image)
+
+        if (self.reference is not None and self.consecutive_skips < self.max_skip
+                and cv2.absdiff(thumbnail, self.reference).mean() < self.threshold):
+            self.consecutive_skips += 1
+            self.skipped_count += 1
+            detections = [d.copy() for d in self.last_detections]
+            return self.annotate(image, detections, in_place) if render else None, detections
+
+        annotated, detections = self.detector.detect(image, render=render, in_place=in_place)
+        self.reference = thumbnail
+        self.last_detections = detections
+        self.consecutive_skips = 0
+        self.inference_count += 1
+        return annotated, detections
+
+    def annotate(self, image, detections, in_place=False):
+        return self.detector.annotate(image, detections, in_place)
+
+    def iter_detect(self, frames, render=True, in_place=False):
+        for frame in frames:
+            yield self.detect(frame, render, in_place)
+
+    def _thumbnail(self, image):
+        height, width = image.shape[:2]
+        size = (self.downscale_width, max(1, round(height * self.downscale_width / width)))
+        small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
@@ -0,0 +1,191 @@
+"""
+NumPy pre/postprocessing for YOLO detection outputs
+"""
+
+import cv2
+import numpy as np
+
+# Per-class box offset for class-aware NMS in one pass, same value as ultralytics
+MAX_WH = 7680
+
+
+def letterbox_geometry(height, width, new_shape=(640, 640), auto=False, stride=32):
+    """(ratio, (unpad_w, unpad_h), (top, bottom, left, right)) of letterboxing a height x width image"""
+    new_h, new_w = new_shape
+
+    ratio = min(new_h / height, new_w / width)
+    unpad_w, unpad_h = round(width * ratio), round(height * ratio)
+    dw, dh = new_w - unpad_w, new_h - unpad_h
+    if auto:
+        dw, dh = dw % stride, dh % stride
+    dw /= 2
+    dh /= 2
+
+    top, bottom = round(dh - 0.1), round(dh + 0.1)
+    left, right = round(dw - 0.1), round(dw + 0.1)
+    return ratio, (unpad_w, unpad_h), (top, bottom, left, right)
+
+
+def letterbox(image, new_shape=(640, 640), auto=False, stride=32, color=(114, 114, 114)):
+    """Resize keeping aspect ratio and pad to new_shape, returns (image, ratio, (pad_left, pad_top))"""
+    height, width = image.shape[:2]
+    ratio, unpad, (top, bottom, left, right) = letterbox_geometry(height, width, new_shape, auto, stride)
+
+    if (width, height) != unpad:
+        image = cv2.resize(image, unpad, interpolation=cv2.INTER_LINEAR)
+
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return image, ratio, (left, top)
+
+
+def preprocess_batch(images, imgsz=640, stride=32):
+    """Letterboxed NCHW float32 RGB batch plus per-image (ratio, pad, shape) transforms"""
+    # Same-shape batches get minimal stride-aligned padding, like ultralytics on dynamic models
+    auto = len({image.shape for image in images}) == 1
+    letterboxed = []
+    transforms = []
+    for image in images:
+        boxed, ratio, pad = letterbox(image, (imgsz, imgsz), auto=auto, stride=stride)
+        letterboxed.append(boxed)
+        transforms.append((ratio, pad, image.shape[:2]))
+
+    batch = np.stack(letterboxed)[..., ::-1].transpose(0, 3, 1, 2)
+    batch = np.ascontiguousarray(batch, dtype=np.float32)
+    batch /= 255.0
+    return batch, transforms
+
+
+class PreprocessBuffers:
+    """Letterbox and input tensor buffers allocated once per resolution and reused for every frame.
+
+    For same-shape BGR uint8 batches (video frames), the resize is written
+    straight into the padded letterbox, and the BGR->RGB, HWC->CHW and /255
+    conversion straight into the float32 input tensor. A fixed-resolution
+    video allocates nothing per frame after the first. Other batches fall
+    back to preprocess_batch(). The returned tensor is overwritten by the next
+    call, so it has to be consumed (inferred) first.
+    """
+
+    def __init__(self, max_resolutions=8):
+        self.max_resolutions = max_resolutions
+        self.buffers = {}
+        self.allocations = 0
+
+    def preprocess(self, images, imgsz=640, stride=32):
+        """Same result as preprocess_batch(images, imgsz, stride)"""
+        shapes = {image.shape for image in images}
+        shape = images[0].shape
+        if len(shapes) != 1 or len(shape) != 3 or shape[2] != 3 or images[0].dtype != np.uint8:
+            return preprocess_batch(images, imgsz, stride)
+
+        key = (len(images), shape, imgsz, stride)
+        buffer = self.buffers.pop(key, None) or self._allocate(key)
+        # Most recently used last, the oldest resolution goes first
+        self.buffers[key] = buffer
+        if len(self.buffers) > self.max_resolutions:
+            del self.buffers[next(iter(self.buffers))]
+
+        letterboxed, region, planes, tensor, transform = buffer
+        for i, image in enumerate(images):
+            if region.shape[:2] == image.shape[:2]:
+                np.copyto(region, image)
+            else:
+                cv2.resize(image, (region.shape[1], region.shape[0]), dst=region, interpolation=cv2.INTER_LINEAR)
+            cv2.split(letterboxed, planes)
+            for channel in range(3):
+                np.copyto(tensor[i, channel], planes[2 - channel], casting='unsafe')
+        np.divide(tensor, np.float32(255.0), out=tensor)
+        return tensor, [transform] * len(images)
+
+    def _allocate(self, key):
+        count, (height, width, _), imgsz, stride = key
+        ratio, (unpad_w, unpad_h), (top, bottom, left, right) = letterbox_geometry(height, width, (imgsz, imgsz),
+                                                                                     auto=True, stride=stride)
+        letterboxed = np.full((top + unpad_h + bottom, left + unpad_w + right, 3), 114, dtype=np.uint8)
+        region = letterboxed[top:top + unpad_h, left:left + unpad_w]
+        planes = [np.empty(letterboxed.shape[:2], dtype=np.uint8) for _ in range(3)]
+        tensor = np.empty((count, 3) + letterboxed.shape[:2], dtype=np.float32)
+        self.allocations += 1
+        return letterboxed, region, planes, tensor, (ratio, (left, top), (height, width))
+
+
+def xywh2xyxy(boxes):
+    xyxy = np.empty_like(boxes)
+    half_w = boxes[:, 2] / 2
+    half_h = boxes[:, 3] / 2
+    xyxy[:, 0] = boxes[:, 0] - half_w
+    xyxy[:, 1] = boxes[:, 1] - half_h
+    xyxy[:, 2] = boxes[:, 0] + half_w
+    xyxy[:, 3] = boxes[:, 1] + half_h
+    return xyxy
+
+
+def candidates_from_raw(output, conf_threshold):
+    """Raw (4 + nc, anchors) head output of one image -> (N, 6) [x1, y1, x2, y2, conf, cls], best class per anchor"""
+    pred = output.T
+    scores = pred[:, 4:]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    mask = confidences > conf_threshold
+    boxes = xywh2xyxy(pred[mask, :4])
+    return np.column_stack([boxes, confidences[mask], class_ids[mask]]).astype(np.float32)
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy NMS, returns kept indices in descending score order"""
+    order = scores.argsort()[::-1]
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        inter_w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-7)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def apply_nms(candidates, iou_threshold, max_det=300, max_nms=30000):
+    """Class-aware NMS over (N, 6) candidates, returns at most max_det rows sorted by confidence"""
+    if len(candidates) == 0:
+        return candidates
+
+    if len(candidates) > max_nms:
+        candidates = candidates[candidates[:, 4].argsort()[::-1][:max_nms]]
+
+    offset_boxes = candidates[:, :4] + candidates[:, 5:6] * MAX_WH
+    keep = nms(offset_boxes, candidates[:, 4], iou_threshold)[:max_det]
+    return candidates[keep]
+
+
+def scale_boxes(detections, ratio, pad, shape):
+    """Map (N, 6) letterboxed detections back to the original (height, width) image, in place"""
+    if len(detections) == 0:
+        return detections
+
+    detections[:, [0, 2]] -= pad[0]
+    detections[:, [1, 3]] -= pad[1]
+    detections[:, :4] /= ratio
+    detections[:, [0, 2]] = detections[:, [0, 2]].clip(0, shape[1])
+    detections[:, [1, 3]] = detections[:, [1, 3]].clip(0, shape[0])
+    return detections
+
+
+def filter_candidates(candidates, transform, conf_threshold, iou_threshold, max_det=300):
+    """Final detections from letterbox-space pre-NMS candidates: confidence filter, NMS, map to the original image.
+
+    Gives the same result as inferring at conf_threshold, for any threshold at
+    or above the one the candidates were collected with.
+    """
+    ratio, pad, shape = transform
+    kept = apply_nms(candidates[candidates[:, 4] > conf_threshold], iou_threshold, max_det)
+    return scale_boxes(kept.copy(), ratio, pad, shape)
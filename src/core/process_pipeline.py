@@ -0,0 +1,225 @@
+"""
+Multiprocess decode / infer / encode pipeline over a shared frame ring
+"""
+
+import logging
+import multiprocessing as mp
+import queue
+from collections import deque
+
+import cv2
+
+from src.core.shared_frames import SharedFrameRing
+from src.core.video_io import open_video_writer
+
+logger = logging.getLogger(__name__)
+
+_POLL_TIMEOUT = 0.1
+
+
+def _get(q, stop_event):
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=_POLL_TIMEOUT)
+        except queue.Empty:
+            continue
+    return None
+
+
+def _run_stage(name, stage, ring_descriptor, status_queue, stop_event, *args):
+    ring = SharedFrameRing.attach(ring_descriptor)
+    try:
+        stage(ring, stop_event, status_queue, *args)
+    except Exception as e:
+        status_queue.put(('error', name, str(e)))
+        stop_event.set()
+    ring.close()
+
+
+def _decode_stage(ring, stop_event, status_queue, input_path, free_slots, decoded):
+    cap = cv2.VideoCapture(input_path)
+    try:
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open video: {input_path}")
+
+        seq = 0
+        while not stop_event.is_set():
+            slot = _get(free_slots, stop_event)
+            if slot is None:
+                break
+
+            frame = ring.slot(slot)
+            ret, decoded_frame = cap.read(frame)
+            if not ret:
+                break
+            if decoded_frame is not frame:
+                frame[...] = decoded_frame
+
+            decoded.put((seq, slot))
+            seq += 1
+    finally:
+        cap.release()
+        decoded.put(None)
+
+
+def _inference_stage(ring, stop_event, status_queue, model_path, config, batch_size, render, sidecar_path, source,
+                     decoded, inferred):
+    from src.core.candidate_sidecar import CandidateSidecarWriter
+    from src.core.detector import SpeedSignDetector
+    from src.core.video_processor import VideoProcessor
+
+    processor = VideoProcessor(SpeedSignDetector(model_path=model_path, config=config))
+    pending = deque()
+    sidecar = None
+    if sidecar_path is not None:
+        height, width = ring.shape[:2]
+        sidecar = CandidateSidecarWriter.for_detector(sidecar_path, processor.detector, source, width, height)
+
+    def frames():
+        while True:
+            item = _get(decoded, stop_event)
+            if item is None:
+                return
+            pending.append(item)
+            yield ring.slot(item[1])
+
+    try:
+        # Annotations are drawn straight into the shared slot
+        for _, detections in processor.iter_frame_results(frames(), batch_size, render, in_place=True,
+                                                          sidecar=sidecar):
+            seq, slot = pending.popleft()
+            inferred.put((seq, slot, len(detections)))
+
+        status_queue.put(('stats', processor.analysis_stats()))
+    finally:
+        if sidecar is not None:
+            sidecar.close()
+        inferred.put(None)
+
+
+def _encode_stage(ring, stop_event, status_queue, output_path, fps, size, config, inferred, free_slots):
+    """Writes annotated slots in order, without output_path it only counts and recycles them"""
+    out = None
+    if output_path is not None:
+        out = open_video_writer(output_path, fps, size, config)
+        if not out.isOpened():
+            raise RuntimeError(f"Cannot create output video: {output_path}")
+
+    frame_count = 0
+    detection_count = 0
+    try:
+        while True:
+            item = _get(inferred, stop_event)
+            if item is None:
+                break
+
+            seq, slot, count = item
+            if seq != frame_count:
+                raise RuntimeError(f"Frame order broken: expected {frame_count}, got {seq}")
+
+            if out is not None:
+                out.write(ring.slot(slot))
+            free_slots.put(slot)
+
+            frame_count += 1
+            detection_count += count
+            if frame_count % 10 == 0:
+                status_queue.put(('progress', frame_count, detection_count))
+    finally:
+        if out is not None:
+            out.release()
+
+    if not stop_event.is_set():
+        status_queue.put(('done', frame_count, detection_count))
+
+
+class ProcessVideoPipeline:
+    """Decoder, inference and encoder processes sharing a ring of frame slots.
+
+    Only slot indices travel through the queues; frames are decoded straight
+    into shared memory, annotated in place and encoded from the same slot.
+    """
+
+    def __init__(self, model_path, config, batch_size=1, slots=16, sidecar_path=None):
+        self.model_path = str(model_path)
+        self.config = config
+        self.batch_size = batch_size
+        self.slots = max(slots, 2 * batch_size + 2)
+        self.sidecar_path = str(sidecar_path) if sidecar_path is not None else None
+        self.stats = {}
+
+    def run(self, input_path, output_path, fps, width, height, progress_callback=None):
+        """Process the video, returns (frame_count, detection_count), raises RuntimeError on stage failure"""
+        ctx = mp.get_context('spawn')
+        ring = SharedFrameRing.create((height, width, 3), self.slots)
+
+        free_slots = ctx.Queue()
+        decoded = ctx.Queue()
+        inferred = ctx.Queue()
+        status_queue = ctx.Queue()
+        stop_event = ctx.Event()
+
+        for slot in range(self.slots):
+            free_slots.put(slot)
+
+        descriptor = ring.descriptor()
+        stages = [
+            ('decode', _decode_stage, (input_path, free_slots, decoded)),
+            ('inference', _inference_stage, (self.model_path, self.config, self.batch_size, output_path is not None,
+                                             self.sidecar_path, input_path, decoded, inferred)),
+            ('encode', _encode_stage, (output_path, fps, (width, height), self.config, inferred, free_slots)),
+        ]
+        processes = [
+            ctx.Process(target=_run_stage, name=f"video-{name}", daemon=True,
+                        args=(name, stage, descriptor, status_queue, stop_event) + args)
+            for name, stage, args in stages
+        ]
+
+        try:
+            for process in processes:
+                process.start()
+
+            while True:
+                try:
+                    message = status_queue.get(timeout=0.5)
+                except queue.Empty:
+                    dead = [p.name for p in processes if p.exitcode not in (None, 0)]
+                    if dead:
+                        raise RuntimeError(f"Pipeline process exited unexpectedly: {', '.join(dead)}")
+                    continue
+
+                kind = message[0]
+                if kind == 'error':
+                    raise RuntimeError(f"{message[1]} stage failed: {message[2]}")
+                if kind == 'stats':
+                    self.stats.update(message[1])
+                    continue
+                if progress_callback:
+                    progress_callback(message[1], message[2])
+                if kind == 'done':
+                    break
+
+            for process in processes:
+                process.join()
+            self._drain_stats(status_queue)
+            return message[1], message[2]
+
+        finally:
+            stop_event.set()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    logger.warning(f"Terminating {process.name}")
+                    process.terminate()
+                    process.join()
+            ring.close()
+            ring.unlink()
+
+    def _drain_stats(self, status_queue):
+        while True:
+            try:
+                message = status_queue.get(timeout=_POLL_TIMEOUT)
+            except queue.Empty:
+                return
+            if message[0] == 'stats':
+                self.stats.update(message[1])
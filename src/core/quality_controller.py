@@ -0,0 +1,160 @@
+"""
+Adaptive quality: trade inference size, detection stride and rendering for a target frame rate
+"""
+
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def quality_levels(input_size=640, min_input_size=320, size_step=64, max_stride=4, render_off=False):
+    """Ladder of {'input_size', 'stride', 'render'} levels from full quality down to the cheapest allowed.
+
+    The input size shrinks first (in stride-aligned steps), then detection
+    runs on every 2nd, 3rd... frame at the smallest size, and dropping the
+    box overlay comes last when render_off allows it.
+    """
+    sizes = [input_size]
+    while sizes[-1] - size_step >= min_input_size:
+        sizes.append(sizes[-1] - size_step)
+
+    levels = [{'input_size': size, 'stride': 1, 'render': True} for size in sizes]
+    levels += [{'input_size': sizes[-1], 'stride': stride, 'render': True} for stride in range(2, max_stride + 1)]
+    if render_off:
+        levels.append(dict(levels[-1], render=False))
+    return levels
+
+
+def _cost(level, full_size):
+    """Relative inference cost of a level, pixels per inference over frames per inference"""
+    return (level['input_size'] / full_size) ** 2 / level['stride']
+
+
+class QualityController:
+    """Feedback controller stepping through quality levels to keep per-frame time within 1 / fps_target.
+
+    Every window frames (counted from the last change) the mean frame time is
+    compared with the budget. Above it, quality steps down one level. Quality
+    steps back up only when the next level's predicted time, scaled by its
+    relative cost, stays below upgrade_margin of the budget, which keeps the
+    controller from oscillating between two levels.
+    """
+
+    def __init__(self, fps_target, levels, window=15, upgrade_margin=0.85, log_callback=None):
+        self.budget = 1.0 / fps_target
+        self.levels = levels
+        self.window = window
+        self.upgrade_margin = upgrade_margin
+        self.log_callback = log_callback
+        self.index = 0
+        self.adjustments = 0
+        self.lowest = 0
+        self.frame_times = deque(maxlen=window)
+
+    @classmethod
+    def from_config(cls, config, log_callback=None):
+        processing = config.get('processing', {})
+        levels = quality_levels(processing.get('input_size', 640),
+                                processing.get('adaptive_min_input_size', 320),
+                                processing.get('adaptive_size_step', 64),
+                                processing.get('adaptive_max_stride', 4),
+                                processing.get('adaptive_render_off', False))
+        return cls(processing.get('fps_target') or 30, levels, processing.get('adaptive_window', 15),
+                   log_callback=log_callback)
+
+    @property
+    def level(self):
+        return self.levels[self.index]
+
+    def record(self, frame_seconds):
+        """Add the measured time of one frame, changing level when a full window is over or well under budget"""
+        self.frame_times.append(frame_seconds)
+        if len(self.frame_times) < self.window:
+            return
+
+        mean = sum(self.frame_times) / len(self.frame_times)
+        if mean > self.budget and self.index < len(self.levels) - 1:
+            self._step(1, mean)
+        elif self.index > 0:
+            full_size = self.levels[0]['input_size']
+            predicted = mean * _cost(self.levels[self.index - 1], full_size) / _cost(self.level, full_size)
+            if predicted < self.budget * self.upgrade_margin:
+                self._step(-1, mean)
+
+    def monitor(self, results):
+        """Pass results through, timing each frame including what the consumer does with it"""
+        last = time.perf_counter()
+        for result in results:
+            yield result
+            now = time.perf_counter()
+            self.record(now - last)
+            last = now
+
+    def _step(self, direction, mean):
+        previous = self.level
+        self.index += direction
+        self.lowest = max(self.lowest, self.index)
+        self.adjustments += 1
+        self.frame_times.clear()
+
+        changes = ', '.join(f"{key} {previous[key]} -> {self.level[key]}" for key in ('input_size', 'stride', 'render')
+                            if previous[key] != self.level[key])
+        message = (f"Quality {'down' if direction > 0 else 'up'} to level {self.index}/{len(self.levels) - 1}: "
+                   f"{changes} (frame {mean * 1000:.1f} ms, budget {self.budget * 1000:.1f} ms)")
+        if self.log_callback:
+            self.log_callback(message, "INFO")
+        else:
+            logger.info(message)
+
+    def stats(self):
+        return {'quality_adjustments': self.adjustments, 'quality_level': self.index, 'quality_lowest': self.lowest,
+                'input_size': self.level['input_size'], 'detect_stride': self.level['stride'],
+                'render': self.level['render']}
+
+
+class AdaptiveQualityDetector:
+    """Applies the controller's current level to every frame.
+
+    The input size is set on the detector's backend, frames between
+    detections (stride) reuse the last detections, and with rendering off
+    frames are passed through undrawn. Exposes detect()/annotate()/config so
+    it can stand in for the detector under motion gating and tracking.
+    """
+
+    def __init__(self, detector, controller):
+        self.detector = detector
+        self.controller = controller
+        self.original_size = detector.input_size()
+        self.last_detections = []
+        self.frames_since_detection = None
+
+    @property
+    def config(self):
+        return self.detector.config
+
+    def detect(self, image, render=True, in_place=False):
+        level = self.controller.level
+        if self.frames_since_detection is not None and self.frames_since_detection + 1 < level['stride']:
+            self.frames_since_detection += 1
+            detections = [d.copy() for d in self.last_detections]
+        else:
+            self.detector.set_input_size(level['input_size'])
+            _, detections = self.detector.detect(image, render=False)
+            self.last_detections = detections
+            self.frames_since_detection = 0
+        return self.annotate(image, detections, in_place) if render else None, detections
+
+    def annotate(self, image, detections, in_place=False):
+        if not self.controller.level['render']:
+            return image
+        return self.detector.annotate(image, detections, in_place)
+
+    def iter_detect(self, frames, render=True, in_place=False):
+        for frame in frames:
+            yield self.detect(frame, render, in_place)
+
+    def restore(self):
+        """Put the detector back at its configured input size"""
+        self.detector.set_input_size(self.original_size)
@@ -0,0 +1,98 @@
+"""
+Detection annotation rendering with cached label sprites
+"""
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.8
+FONT_THICKNESS = 2
+BOX_THICKNESS = 3
+
+
+def confidence_color(conf):
+    """Box color based on confidence"""
+    if conf >= 0.8:
+        return (0, 255, 0)  # Green (high confidence)
+    if conf >= 0.6:
+        return (0, 165, 255)  # Orange (medium)
+    return (0, 100, 255)  # Red (low)
+
+
+def detection_label(detection):
+    speed = detection['speed_limit']
+    conf = detection['confidence']
+    return f"{speed} km/h ({conf:.2f})" if speed else f"{detection['class_name']} ({conf:.2f})"
+
+
+class LabelSprite:
+    """Pre-rendered label: pixels, drawn-pixel mask and offset of its top-left corner from the box corner"""
+
+    __slots__ = ('pixels', 'mask', 'offset')
+
+    def __init__(self, label, color):
+        (w, h), baseline = cv2.getTextSize(label, FONT, FONT_SCALE, FONT_THICKNESS)
+        # Glyphs may reach past the label background (descenders), keep a margin so they are not cut off
+        pad = baseline + FONT_THICKNESS + 2
+        size = (h + 10 + 2 * pad + 1, w + 2 * pad + 1)
+
+        # Drawn on black and on white, pixels equal in both are the ones the label covers
+        canvases = []
+        for background in (0, 255):
+            canvas = np.full(size + (3,), background, dtype=np.uint8)
+            cv2.rectangle(canvas, (pad, pad), (pad + w, pad + h + 10), color, -1)
+            cv2.putText(canvas, label, (pad, pad + h + 5), FONT, FONT_SCALE, (255, 255, 255), FONT_THICKNESS)
+            canvases.append(canvas)
+
+        self.pixels = canvases[1]
+        self.mask = (canvases[0] == canvases[1]).all(axis=2).astype(np.uint8)
+        self.offset = (-pad, -(h + 10 + pad))
+
+    def blit(self, image, x, y):
+        """Draw onto image with the label background's bottom-left corner at (x, y), clipped to the image"""
+        left, top = x + self.offset[0], y + self.offset[1]
+        height, width = self.mask.shape
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + width, image.shape[1]), min(top + height, image.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        sprite = (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left))
+        cv2.copyTo(self.pixels[sprite], self.mask[sprite], image[y0:y1, x0:x1])
+
+
+class DetectionRenderer:
+    """Draws boxes and labels, label text is rendered once per (label, color) and reused.
+
+    Labels show the confidence with two decimals, so the cache holds at most
+    one sprite per class and 0.01 confidence bucket.
+    """
+
+    def __init__(self, max_sprites=2048):
+        self.max_sprites = max_sprites
+        self.sprites = {}
+
+    def draw(self, image, detections, in_place=False):
+        """Annotated image, a copy unless in_place"""
+        annotated = image if in_place else image.copy()
+        for detection in detections:
+            self.draw_detection(annotated, detection)
+        return annotated
+
+    def draw_detection(self, image, detection):
+        x1, y1, x2, y2 = detection['bbox']
+        color = confidence_color(detection['confidence'])
+
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, BOX_THICKNESS)
+        self.sprite(detection_label(detection), color).blit(image, x1, y1)
+        return image
+
+    def sprite(self, label, color):
+        key = (label, color)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            if len(self.sprites) >= self.max_sprites:
+                self.sprites.clear()
+            sprite = self.sprites[key] = LabelSprite(label, color)
+        return sprite
@@ -0,0 +1,135 @@
+"""
+Regions of interest: infer only where speed limit signs appear instead of the whole frame
+"""
+
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _area(region):
+    return (region[2] - region[0]) * (region[3] - region[1])
+
+
+def merge_regions(regions):
+    """Merge pixel regions whose bounding box has no more pixels than the two regions together"""
+    regions = list(regions)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                union = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                if _area(union) <= _area(a) + _area(b):
+                    regions[i] = union
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+class RegionOfInterestDetector:
+    """Infers only the regions of each frame where signs show up, with a periodic full frame.
+
+    Static regions are [x1, y1, x2, y2] fractions of the frame. With adaptive
+    on, a region is also learned from the extent of this video's recent
+    detections plus a margin. Every full_frame_interval-th inference covers
+    the whole frame, so signs outside the regions are still found (and teach
+    the adaptive region). Exposes detect()/annotate()/config/input_size() so
+    it can stand in for the detector.
+    """
+
+    def __init__(self, detector, regions=(), adaptive=False, full_frame_interval=30, margin=0.05, history=200,
+                 min_history=5):
+        self.detector = detector
+        self.static_regions = [tuple(float(v) for v in region) for region in regions]
+        self.adaptive = adaptive
+        self.full_frame_interval = max(1, full_frame_interval)
+        self.margin = margin
+        self.min_history = min_history
+        self.history = deque(maxlen=history)
+        self.inference_count = 0
+        self.full_frame_count = 0
+        self.inferred_pixels = 0
+        self.frame_pixels = 0
+
+    @classmethod
+    def from_config(cls, detector):
+        processing = detector.config.get('processing', {})
+        return cls(detector,
+                   regions=processing.get('rois') or (),
+                   adaptive=processing.get('roi_adaptive', False),
+                   full_frame_interval=processing.get('roi_full_frame_interval', 30),
+                   margin=processing.get('roi_margin', 0.05),
+                   history=processing.get('roi_history', 200))
+
+    @property
+    def config(self):
+        return self.detector.config
+
+    def input_size(self):
+        return self.detector.input_size()
+
+    def set_input_size(self, size):
+        self.detector.set_input_size(size)
+
+    def learned_region(self):
+        """Fractional region covering the recent detections, None until min_history boxes were seen"""
+        if len(self.history) < self.min_history:
+            return None
+        boxes = np.array(self.history)
+        x1, y1 = np.percentile(boxes[:, :2], 2, axis=0) - self.margin
+        x2, y2 = np.percentile(boxes[:, 2:], 98, axis=0) + self.margin
+        return max(0.0, x1), max(0.0, y1), min(1.0, x2), min(1.0, y2)
+
+    def regions(self, width, height):
+        """Pixel regions to infer on a frame of this size, empty when the whole frame has to be inferred"""
+        regions = list(self.static_regions)
+        learned = self.learned_region() if self.adaptive else None
+        if learned is not None:
+            regions.append(learned)
+
+        pixels = []
+        for x1, y1, x2, y2 in regions:
+            region = (max(0, int(x1 * width)), max(0, int(y1 * height)),
+                      min(width, round(x2 * width)), min(height, round(y2 * height)))
+            if region[2] > region[0] and region[3] > region[1]:
+                pixels.append(region)
+        return merge_regions(pixels)
+
+    def detect(self, image, render=True, in_place=False):
+        height, width = image.shape[:2]
+        regions = self.regions(width, height)
+
+        if not regions or self.inference_count % self.full_frame_interval == 0:
+            annotated, detections = self.detector.detect(image, render=render, in_place=in_place)
+            self.full_frame_count += 1
+            self.inferred_pixels += width * height
+        else:
+            annotated, detections = self.detector.detect_regions(image, regions, render=render, in_place=in_place)
+            self.inferred_pixels += sum(_area(region) for region in regions)
+        self.frame_pixels += width * height
+        self.inference_count += 1
+
+        if self.adaptive:
+            for detection in detections:
+                x1, y1, x2, y2 = detection['bbox']
+                self.history.append((x1 / width, y1 / height, x2 / width, y2 / height))
+        return annotated, detections
+
+    def annotate(self, image, detections, in_place=False):
+        return self.detector.annotate(image, detections, in_place)
+
+    def iter_detect(self, frames, render=True, in_place=False):
+        for frame in frames:
+            yield self.detect(frame, render, in_place)
+
+    def pixel_fraction(self):
+        """Inferred pixels over the pixels of the frames inferred so far"""
+        return self.inferred_pixels / self.frame_pixels if self.frame_pixels else 1.0
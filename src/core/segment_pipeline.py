@@ -0,0 +1,309 @@
+"""
+Segment-parallel video processing: frame ranges in a process pool, joined in order
+"""
+
+import logging
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+
+from src.core.candidate_sidecar import CandidateSidecarWriter, concat_sidecars
+from src.core.video_io import encoder_arguments, open_video_writer, scaled_size, video_settings
+
+logger = logging.getLogger(__name__)
+
+_processor = None
+_progress = None
+
+
+# Per-segment analysis stats that add up over the video, the others describe a level (see merge_stats)
+SUMMED_STATS = ('tracker_inferences', 'gate_inferences', 'skipped', 'tracks', 'quality_adjustments', 'roi_full_frames',
+                'roi_inferred_pixels', 'roi_frame_pixels')
+
+
+def merge_stats(segment_stats):
+    """Analysis stats of the whole video from those of its segments, in order.
+
+    Counters are summed. The adaptive quality level is the one the last
+    segment ended at, quality_lowest the lowest any segment reached, and
+    segment_input_sizes lists the input size each segment ended at. The
+    region of interest pixel fraction is recomputed from the summed pixels.
+    """
+    merged = {}
+    for stats in segment_stats:
+        for key, value in stats.items():
+            if key in SUMMED_STATS:
+                merged[key] = merged.get(key, 0) + value
+            elif key == 'quality_lowest':
+                merged[key] = max(merged.get(key, 0), value)
+            else:
+                merged[key] = value
+    if merged.get('roi_frame_pixels'):
+        merged['roi_pixel_fraction'] = merged['roi_inferred_pixels'] / merged['roi_frame_pixels']
+    sizes = [stats['input_size'] for stats in segment_stats if 'input_size' in stats]
+    if sizes:
+        merged['segment_input_sizes'] = sizes
+    return merged
+
+
+def plan_segments(total_frames, count, min_frames=300):
+    """[(start, end)] frame ranges covering the video in order.
+
+    The last range is open-ended (end None) and reads to the end of the
+    stream, so a frame count reported short by the container drops nothing.
+    """
+    count = max(1, min(count, total_frames // max(1, min_frames)))
+    bounds = [round(i * total_frames / count) for i in range(count + 1)]
+    return [(bounds[i], bounds[i + 1] if i < count - 1 else None) for i in range(count)]
+
+
+def _init_worker(model_path, config, threads, progress_queue):
+    from src.core.detector import SpeedSignDetector
+    from src.core.video_processor import VideoProcessor
+
+    global _processor, _progress
+    cv2.setNumThreads(threads)
+    if config.get('model', {}).get('backend', 'pytorch') == 'pytorch':
+        import torch
+        torch.set_num_threads(threads)
+    _processor = VideoProcessor(SpeedSignDetector(model_path=model_path, config=config))
+    _progress = progress_queue
+
+
+def _seek(cap, start, fps):
+    """Decode frame start of cap and return it, None past the end of the stream.
+
+    CAP_PROP_POS_FRAMES echoes the requested index even when the container
+    seek landed on another frame, so the seek is judged by the timestamp of
+    the frame it decodes, against frame 0's plus start / fps. When that is
+    off by half a frame or more (inexact keyframe seek, variable frame rate),
+    frames are grabbed from the beginning instead.
+    """
+    ret, frame = cap.read()
+    if not ret or start == 0:
+        return frame if ret else None
+
+    origin = cap.get(cv2.CAP_PROP_POS_MSEC)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    ret, frame = cap.read()
+    if ret and fps and abs(cap.get(cv2.CAP_PROP_POS_MSEC) - origin - start * 1000 / fps) < 500 / fps:
+        return frame
+
+    logger.warning(f"Inexact seek to frame {start}, grabbing from the start instead")
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(start):
+        if not cap.grab():
+            return None
+    ret, frame = cap.read()
+    return frame if ret else None
+
+
+def _process_segment(index, input_path, start, end, segment_path, codec, sidecar_path, fps, size, keep_detections):
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {input_path}")
+    first = _seek(cap, start, fps)
+
+    def frames():
+        if first is None or end == start:
+            return
+        yield first
+        read = 1
+        while end is None or read < end - start:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            read += 1
+            yield frame
+
+    out = None
+    if segment_path is not None:
+        out = cv2.VideoWriter(segment_path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if not out.isOpened():
+            raise RuntimeError(f"Cannot create segment video: {segment_path}")
+    sidecar = None
+    if sidecar_path is not None:
+        sidecar = CandidateSidecarWriter.for_detector(sidecar_path, _processor.detector, input_path, *size)
+
+    frame_count = 0
+    detection_count = 0
+    detections = []
+    begin = time.perf_counter()
+    try:
+        for annotated, frame_detections in _processor.iter_frame_results(frames(), None, out is not None,
+                                                                         in_place=True, sidecar=sidecar):
+            if out is not None:
+                out.write(annotated)
+            if keep_detections:
+                detections.append(frame_detections)
+            frame_count += 1
+            detection_count += len(frame_detections)
+            if frame_count % 10 == 0:
+                _progress.put((index, frame_count, detection_count))
+    finally:
+        cap.release()
+        if out is not None:
+            out.release()
+        if sidecar is not None:
+            sidecar.close()
+
+    _progress.put((index, frame_count, detection_count))
+    return {'frames': frame_count, 'detections': detection_count, 'frame_detections': detections,
+            'stats': _processor.analysis_stats(), 'seconds': time.perf_counter() - begin}
+
+
+def segment_format(config=None):
+    """(suffix, fourcc) of segment files: mp4v to stream-copy into mp4v output with ffmpeg, lossless FFV1 otherwise"""
+    settings = video_settings(config or {})
+    copyable = settings['codec'] == 'mp4v' and not settings['output_width']
+    return ('.mp4', 'mp4v') if shutil.which('ffmpeg') and copyable else ('.mkv', 'FFV1')
+
+
+def join_segments(paths, output_path, fps, size, config=None):
+    """Concatenate segment videos in order, by ffmpeg when it is installed (stream-copied for mp4 segments)"""
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        list_path = Path(paths[0]).with_name('segments.txt')
+        list_path.write_text(''.join(f"file '{Path(path).resolve()}'\n" for path in paths))
+        if all(Path(path).suffix == '.mp4' for path in paths):
+            arguments, method = ['-c', 'copy'], 'ffmpeg'
+        else:
+            settings = video_settings(config or {})
+            arguments = encoder_arguments(settings, size, scaled_size(size[0], size[1], settings['output_width']))
+            method = 'ffmpeg encode'
+        subprocess.run([ffmpeg, '-y', '-v', 'error', '-f', 'concat', '-safe', '0', '-i', str(list_path)]
+                       + arguments + [str(output_path)], check=True, capture_output=True)
+        return method
+
+    out = open_video_writer(output_path, fps, size, config or {})
+    if not out.isOpened():
+        raise RuntimeError(f"Cannot create output video: {output_path}")
+    try:
+        for path in paths:
+            cap = cv2.VideoCapture(str(path))
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                out.write(frame)
+            cap.release()
+    finally:
+        out.release()
+    return 'opencv'
+
+
+class SegmentVideoPipeline:
+    """Splits a video into frame ranges processed by a pool with one detector per worker.
+
+    Segments are checked to be contiguous (a range that ends early may only be
+    followed by empty ones), then their annotated videos, candidate sidecars
+    and per-frame detections are joined back in frame order. Tracking and
+    motion gating restart at every segment boundary.
+    """
+
+    def __init__(self, model_path, config, workers=0, min_segment_frames=300, sidecar_path=None):
+        self.model_path = str(model_path)
+        self.config = config
+        self.workers = workers or os.cpu_count() or 1
+        self.min_segment_frames = min_segment_frames
+        self.sidecar_path = str(sidecar_path) if sidecar_path is not None else None
+        self.stats = {}
+
+    def run(self, input_path, output_path, fps, width, height, total_frames, progress_callback=None,
+            detections_callback=None):
+        """Process the video, returns (frame_count, detection_count), raises RuntimeError on failure"""
+        segments = plan_segments(total_frames, self.workers, self.min_segment_frames)
+        workers = min(self.workers, len(segments))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        self.stats = {'segments': len(segments), 'workers': workers}
+
+        suffix, codec = segment_format(self.config)
+        ctx = mp.get_context('spawn')
+        progress_queue = ctx.Queue()
+        work_dir = Path(tempfile.mkdtemp(prefix='segments-', dir=Path(output_path).parent if output_path else None))
+
+        try:
+            if output_path and suffix == '.mkv':
+                self._check_lossless_space(work_dir, width, height, total_frames)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(self.model_path, self.config, threads, progress_queue)) as pool:
+                futures = [
+                    pool.submit(_process_segment, index, input_path, start, end,
+                                str(work_dir / f"segment_{index:04d}{suffix}") if output_path else None, codec,
+                                str(work_dir / f"segment_{index:04d}.candidates") if self.sidecar_path else None,
+                                fps, (width, height), detections_callback is not None)
+                    for index, (start, end) in enumerate(segments)
+                ]
+                self._wait(futures, progress_queue, progress_callback)
+                results = [future.result() for future in futures]
+
+            self._check_contiguous(segments, results)
+
+            frame_count = sum(result['frames'] for result in results)
+            detection_count = sum(result['detections'] for result in results)
+            non_empty = [index for index, result in enumerate(results) if result['frames'] > 0]
+
+            if output_path and non_empty:
+                self.stats['join'] = join_segments([work_dir / f"segment_{i:04d}{suffix}" for i in non_empty],
+                                                   output_path, fps, (width, height), self.config)
+            if self.sidecar_path:
+                concat_sidecars([work_dir / f"segment_{i:04d}.candidates" for i in range(len(results))],
+                                self.sidecar_path)
+            if detections_callback is not None:
+                frame_index = 0
+                for result in results:
+                    for detections in result['frame_detections']:
+                        detections_callback(frame_index, detections)
+                        frame_index += 1
+
+            self.stats.update(merge_stats([result['stats'] for result in results]))
+            self.stats['segment_seconds'] = [round(result['seconds'], 2) for result in results]
+            return frame_count, detection_count
+
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    @staticmethod
+    def _check_lossless_space(work_dir, width, height, total_frames):
+        """Refuse to start when lossless FFV1 segments would not fit next to the output, warn when they are large"""
+        # FFV1 keeps camera footage at roughly half its raw BGR size
+        estimate = width * height * 1.5 * total_frames
+        free = shutil.disk_usage(work_dir).free
+        if estimate > free:
+            raise RuntimeError(f"Lossless segments need about {estimate / 1e9:.1f} GB in {work_dir} but only "
+                               f"{free / 1e9:.1f} GB are free, install ffmpeg (mp4v output) or use another "
+                               f"pipeline_mode")
+        if estimate > 1e9:
+            logger.warning(f"Segments are written losslessly before the join, about {estimate / 1e9:.1f} GB of "
+                           f"temporary files in {work_dir}. With ffmpeg and mp4v output they are stream-copied "
+                           f"instead")
+
+    @staticmethod
+    def _wait(futures, progress_queue, progress_callback):
+        done = {}
+        while not all(future.done() for future in futures):
+            try:
+                index, frames, detections = progress_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            done[index] = (frames, detections)
+            if progress_callback:
+                progress_callback(sum(f for f, _ in done.values()), sum(d for _, d in done.values()))
+
+    @staticmethod
+    def _check_contiguous(segments, results):
+        ended_early = None
+        for index, ((start, end), result) in enumerate(zip(segments, results)):
+            if ended_early is not None and result['frames'] > 0:
+                raise RuntimeError(f"Segment {ended_early} ended before its last frame but segment {index} "
+                                   f"has frames, the output would skip frames")
+            if end is not None and result['frames'] < end - start:
+                ended_early = index
@@ -0,0 +1,46 @@
+"""
+Shared-memory ring of preallocated frame slots
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedFrameRing:
+    """Fixed number of BGR frame slots in one shared memory block.
+
+    Processes exchange slot indices instead of frames, so a frame is written
+    once into its slot and read in place by every later stage.
+    """
+
+    def __init__(self, shm, shape, slots):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape, slots):
+        size = int(np.prod(shape)) * slots
+        return cls(shared_memory.SharedMemory(create=True, size=size), shape, slots)
+
+    @classmethod
+    def attach(cls, descriptor):
+        name, shape, slots = descriptor
+        return cls(shared_memory.SharedMemory(name=name), shape, slots)
+
+    def descriptor(self):
+        """Picklable (name, shape, slots) used by other processes to attach"""
+        return self.shm.name, self.shape, self.slots
+
+    def slot(self, index):
+        return self._frames[index]
+
+    def close(self):
+        # Views into the buffer must be released before the mapping can close
+        self._frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
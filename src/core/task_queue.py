@@ -0,0 +1,178 @@
+"""
+SQLite task queue with leases for distributing videos over worker hosts
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class TaskQueue:
+    """Video tasks in one SQLite file that every coordinator and worker opens.
+
+    A worker claims the oldest claimable task with a lease and keeps it
+    alive with heartbeat(). A task whose lease runs out (crashed or stalled
+    worker) becomes claimable again, so nothing has to watch the workers.
+    Failed attempts go back to pending until max_attempts is reached. The
+    default rollback journal is kept rather than WAL, which needs shared
+    memory and so does not work on network filesystems.
+    """
+
+    def __init__(self, path, max_attempts=3):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        def create(connection):
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "id INTEGER PRIMARY KEY, source TEXT NOT NULL UNIQUE, output_dir TEXT NOT NULL, "
+                "state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, "
+                "lease_expires REAL, created REAL NOT NULL, started REAL, finished REAL, error TEXT, result TEXT, "
+                "output_name TEXT)")
+            if 'output_name' not in [row[1] for row in connection.execute("PRAGMA table_info(tasks)")]:
+                # Queues created before output names, their tasks are named after the source
+                connection.execute("ALTER TABLE tasks ADD COLUMN output_name TEXT")
+            connection.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, id)")
+
+        # In one transaction, closed afterwards, so hosts opening the queue at once never race on the schema
+        self._transaction(create)
+
+    def _connect(self):
+        # One short-lived connection per call, safe from any thread
+        connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _transaction(self, work):
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(connection)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+            return result
+        finally:
+            connection.close()
+
+    def enqueue(self, sources, output_dir):
+        """Add (source, relative output) pairs not queued before, returns how many were added.
+
+        The outputs of a source are written under output_dir / relative.
+        """
+        now = time.time()
+        rows = [(str(source), str(Path(output_dir) / Path(relative).parent), Path(relative).name, PENDING, now)
+                for source, relative in sources]
+
+        def insert(connection):
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks (source, output_dir, output_name, state, created) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            return connection.total_changes - before
+
+        return self._transaction(insert)
+
+    def claim(self, worker, lease_seconds):
+        """Lease the next pending or lease-expired task to worker, None when there is nothing to do.
+
+        Expired leases without attempts left are failed on the way, so a task
+        whose worker died on its last attempt never stays leased.
+        """
+        def take(connection):
+            now = time.time()
+            connection.execute(
+                "UPDATE tasks SET state = ?, lease_expires = NULL, error = 'lease expired' "
+                "WHERE state = ? AND lease_expires < ? AND attempts >= ?", (FAILED, LEASED, now, self.max_attempts))
+            row = connection.execute(
+                "SELECT * FROM tasks WHERE attempts < ? AND (state = ? OR (state = ? AND lease_expires < ?)) "
+                "ORDER BY id LIMIT 1", (self.max_attempts, PENDING, LEASED, now)).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE tasks SET state = ?, worker = ?, lease_expires = ?, started = ?, attempts = attempts + 1, "
+                "error = NULL WHERE id = ?", (LEASED, worker, now + lease_seconds, now, row['id']))
+            task = dict(row)
+            task.update(state=LEASED, worker=worker, attempts=row['attempts'] + 1)
+            return task
+
+        return self._transaction(take)
+
+    def heartbeat(self, task_id, worker, lease_seconds):
+        """Extend the lease, False when worker no longer holds it (expired and claimed by another)"""
+        def extend(connection):
+            cursor = connection.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE id = ? AND worker = ? AND state = ?",
+                (time.time() + lease_seconds, task_id, worker, LEASED))
+            return cursor.rowcount == 1
+
+        return self._transaction(extend)
+
+    def complete(self, task_id, worker, result):
+        def finish(connection):
+            cursor = connection.execute(
+                "UPDATE tasks SET state = ?, finished = ?, lease_expires = NULL, result = ? "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (DONE, time.time(), json.dumps(result), task_id, worker, LEASED))
+            return cursor.rowcount == 1
+
+        return self._transaction(finish)
+
+    def fail(self, task_id, worker, error):
+        """Release a failed attempt, pending again until max_attempts, failed after"""
+        def release(connection):
+            cursor = connection.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts < ? THEN ? ELSE ? END, lease_expires = NULL, "
+                "finished = ?, error = ? WHERE id = ? AND worker = ? AND state = ?",
+                (self.max_attempts, PENDING, FAILED, time.time(), str(error), task_id, worker, LEASED))
+            return cursor.rowcount == 1
+
+        return self._transaction(release)
+
+    def requeue_expired(self):
+        """Expired leases back to pending (or failed when out of attempts), returns how many"""
+        def release(connection):
+            cursor = connection.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts < ? THEN ? ELSE ? END, lease_expires = NULL, "
+                "error = 'lease expired' WHERE state = ? AND lease_expires < ?",
+                (self.max_attempts, PENDING, FAILED, LEASED, time.time()))
+            return cursor.rowcount
+
+        return self._transaction(release)
+
+    def retry_failed(self):
+        def reset(connection):
+            cursor = connection.execute("UPDATE tasks SET state = ?, attempts = 0 WHERE state = ?", (PENDING, FAILED))
+            return cursor.rowcount
+
+        return self._transaction(reset)
+
+    def counts(self):
+        connection = self._connect()
+        try:
+            counts = {state: 0 for state in (PENDING, LEASED, DONE, FAILED)}
+            for state, count in connection.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"):
+                counts[state] = count
+            return counts
+        finally:
+            connection.close()
+
+    def tasks(self, state=None):
+        connection = self._connect()
+        try:
+            if state is None:
+                rows = connection.execute("SELECT * FROM tasks ORDER BY id")
+            else:
+                rows = connection.execute("SELECT * FROM tasks WHERE state = ? ORDER BY id", (state,))
+            return [dict(row) for row in rows]
+        finally:
+            connection.close()
@@ -0,0 +1,166 @@
+"""
+Centroid tracking with keyframe-only inference
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class Track:
+    """One tracked sign: last detector box plus per-frame box velocity"""
+
+    __slots__ = ('track_id', 'detection', 'bbox', 'velocity', 'last_frame')
+
+    def __init__(self, track_id, detection, frame_index):
+        self.track_id = track_id
+        self.detection = detection
+        self.bbox = np.array(detection['bbox'], dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.last_frame = frame_index
+
+    def predict(self, frame_index):
+        return self.bbox + self.velocity * (frame_index - self.last_frame)
+
+    def centroid(self, frame_index):
+        x1, y1, x2, y2 = self.predict(frame_index)
+        return (x1 + x2) / 2, (y1 + y2) / 2
+
+
+class CentroidTracker:
+    """Greedy nearest-centroid association with stable track IDs"""
+
+    def __init__(self, max_disappeared=30, max_distance=100):
+        self.max_disappeared = max_disappeared
+        self.max_distance = max_distance
+        self.tracks = {}
+        self.next_id = 0
+        self.last_update_frame = None
+
+    def update(self, detections, frame_index):
+        """Match detector output to tracks, sets 'track_id' on each detection"""
+        track_ids = list(self.tracks)
+        matched_tracks = set()
+        matched_detections = set()
+
+        if track_ids and detections:
+            predicted = np.array([self.tracks[t].centroid(frame_index) for t in track_ids], dtype=np.float32)
+            centroids = np.array([_centroid(d['bbox']) for d in detections], dtype=np.float32)
+            distances = np.linalg.norm(predicted[:, None, :] - centroids[None, :, :], axis=2)
+
+            for flat_index in np.argsort(distances, axis=None):
+                row, col = divmod(int(flat_index), len(detections))
+                if distances[row, col] > self.max_distance:
+                    break
+                if row in matched_tracks or col in matched_detections:
+                    continue
+                self._refresh(self.tracks[track_ids[row]], detections[col], frame_index)
+                matched_tracks.add(row)
+                matched_detections.add(col)
+
+        for row, track_id in enumerate(track_ids):
+            if row not in matched_tracks and frame_index - self.tracks[track_id].last_frame > self.max_disappeared:
+                del self.tracks[track_id]
+
+        for col, detection in enumerate(detections):
+            if col not in matched_detections:
+                self._register(detection, frame_index)
+
+        self.last_update_frame = frame_index
+        return detections
+
+    def predict(self, frame_index, width=None, height=None):
+        """Propagated detections for tracks seen on the last keyframe"""
+        detections = []
+        for track in self.tracks.values():
+            if track.last_frame != self.last_update_frame:
+                continue
+
+            x1, y1, x2, y2 = track.predict(frame_index)
+            if width is not None and height is not None:
+                x1, x2 = np.clip([x1, x2], 0, width - 1)
+                y1, y2 = np.clip([y1, y2], 0, height - 1)
+
+            detection = track.detection.copy()
+            detection['bbox'] = (int(round(x1)), int(round(y1)), int(round(x2)), int(round(y2)))
+            detection['propagated'] = True
+            detections.append(detection)
+        return detections
+
+    def has_stale_tracks(self, frame_index, width, height):
+        """True when a visible track is predicted to have left the frame"""
+        for track in self.tracks.values():
+            if track.last_frame != self.last_update_frame:
+                continue
+            cx, cy = track.centroid(frame_index)
+            if not (0 <= cx < width and 0 <= cy < height):
+                return True
+        return False
+
+    def _refresh(self, track, detection, frame_index):
+        bbox = np.array(detection['bbox'], dtype=np.float32)
+        frames = frame_index - track.last_frame
+        if frames > 0:
+            track.velocity = (bbox - track.bbox) / frames
+        track.bbox = bbox
+        track.last_frame = frame_index
+        track.detection = detection
+        detection['track_id'] = track.track_id
+        detection['propagated'] = False
+
+    def _register(self, detection, frame_index):
+        detection['track_id'] = self.next_id
+        detection['propagated'] = False
+        self.tracks[self.next_id] = Track(self.next_id, detection, frame_index)
+        self.next_id += 1
+
+
+class TrackingDetector:
+    """Runs the detector every detect_interval frames and propagates tracks in between"""
+
+    def __init__(self, detector, max_disappeared=30, max_distance=100, detect_interval=5):
+        self.detector = detector
+        self.tracker = CentroidTracker(max_disappeared, max_distance)
+        self.detect_interval = max(1, detect_interval)
+        self.frame_index = 0
+        self.last_detection_frame = None
+        self.inference_count = 0
+
+    @classmethod
+    def from_config(cls, detector):
+        processing = detector.config.get('processing', {})
+        return cls(detector,
+                   max_disappeared=processing.get('tracking_max_disappeared', 30),
+                   max_distance=processing.get('tracking_max_distance', 100),
+                   detect_interval=processing.get('tracking_detect_interval', 5))
+
+    def iter_detect(self, frames, render=True, in_place=False):
+        """Yield (annotated, detections) per frame, every detection carries a track_id"""
+        for frame in frames:
+            height, width = frame.shape[:2]
+
+            if self._needs_detection(width, height):
+                annotated, detections = self.detector.detect(frame, render=render, in_place=in_place)
+                self.tracker.update(detections, self.frame_index)
+                self.last_detection_frame = self.frame_index
+                self.inference_count += 1
+            else:
+                detections = self.tracker.predict(self.frame_index, width, height)
+                annotated = self.detector.annotate(frame, detections, in_place) if render else None
+
+            self.frame_index += 1
+            yield annotated, detections
+
+    def _needs_detection(self, width, height):
+        if self.last_detection_frame is None:
+            return True
+        if self.frame_index - self.last_detection_frame >= self.detect_interval:
+            return True
+        return self.tracker.has_stale_tracks(self.frame_index, width, height)
+
+
+def _centroid(bbox):
+    x1, y1, x2, y2 = bbox
+    return (x1 + x2) / 2, (y1 + y2) / 2
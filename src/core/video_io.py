@@ -0,0 +1,299 @@
+"""
+Video I/O backends: OpenCV, or ffmpeg subprocess pipes with decode-side scaling and configurable encoding
+"""
+
+import logging
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_warned_missing_ffmpeg = False
+
+# Config codec names (fourcc style) -> (ffmpeg encoder, output pixel format)
+FFMPEG_CODECS = {
+    'mp4v': ('mpeg4', 'yuv420p'),
+    'xvid': ('mpeg4', 'yuv420p'),
+    'avc1': ('libx264', 'yuv420p'),
+    'h264': ('libx264', 'yuv420p'),
+    'hvc1': ('libx265', 'yuv420p'),
+    'hevc': ('libx265', 'yuv420p'),
+    'vp09': ('libvpx-vp9', 'yuv420p'),
+    'mjpg': ('mjpeg', 'yuvj420p'),
+    'ffv1': ('ffv1', None),
+}
+
+# video_quality -> (CRF for x264/x265/VP9, -q:v for mpeg4/mjpeg, OpenCV VIDEOWRITER_PROP_QUALITY)
+QUALITY_LEVELS = {
+    'high': (18, 2, 95),
+    'medium': (23, 5, 80),
+    'low': (28, 10, 60),
+}
+
+# Config codec names -> the fourcc OpenCV expects
+OPENCV_FOURCCS = {'h264': 'avc1', 'hevc': 'hvc1', 'ffv1': 'FFV1', 'mjpg': 'MJPG', 'xvid': 'XVID'}
+
+
+def video_settings(config):
+    """Video I/O settings from the video and export sections of the config"""
+    video = config.get('video', {})
+    export = config.get('export', {})
+    return {
+        'backend': video.get('io_backend', 'opencv'),
+        'codec': str(export.get('video_codec') or video.get('default_codec') or 'mp4v').lower(),
+        'quality': export.get('video_quality') or video.get('output_quality') or 'high',
+        'preset': video.get('encode_preset', 'medium'),
+        'threads': video.get('ffmpeg_threads', 0),
+        'decode_width': video.get('decode_width', 0),
+        'output_width': video.get('output_width', 0),
+    }
+
+
+def _ffmpeg(settings):
+    """ffmpeg executable when the ffmpeg backend is configured and installed, None for OpenCV"""
+    global _warned_missing_ffmpeg
+    if settings['backend'] != 'ffmpeg':
+        return None
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None and not _warned_missing_ffmpeg:
+        logger.warning("video.io_backend is ffmpeg but ffmpeg is not installed, using OpenCV video I/O")
+        _warned_missing_ffmpeg = True
+    return ffmpeg
+
+
+def scaled_size(width, height, target_width):
+    """(width, height) scaled down to target_width keeping the aspect ratio, even sized for yuv420p"""
+    if not target_width or target_width >= width:
+        return width, height
+    return target_width - target_width % 2, max(2, round(height * target_width / width / 2) * 2)
+
+
+def open_video_reader(path, config, buffers=4):
+    """Capture-like reader (isOpened/get/read/release) of a video file.
+
+    With video.io_backend ffmpeg, frames are decoded (and scaled to
+    video.decode_width) by an ffmpeg process into a ring of buffers reused
+    frame after frame. At most buffers - 1 frames returned by read() may still
+    be in use when the next one is read. Otherwise OpenCV decodes and scales.
+    """
+    settings = video_settings(config)
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        return cap
+
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    size = scaled_size(width, height, settings['decode_width'])
+
+    ffmpeg = _ffmpeg(settings)
+    if ffmpeg is not None:
+        reader = FFmpegReader(ffmpeg, path, cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), size,
+                              settings['threads'], buffers)
+        cap.release()
+        return reader
+    if size != (width, height):
+        return ScaledCapture(cap, size)
+    return cap
+
+
+def open_video_writer(path, fps, size, config):
+    """Writer (isOpened/write/release) encoding with export.video_codec / video.default_codec at export.video_quality.
+
+    Frames of size are scaled to video.output_width on the way out. With
+    video.io_backend ffmpeg, an ffmpeg process encodes from a pipe (with
+    video.encode_preset and video.ffmpeg_threads), otherwise OpenCV.
+    """
+    settings = video_settings(config)
+    output_size = scaled_size(size[0], size[1], settings['output_width'])
+
+    ffmpeg = _ffmpeg(settings)
+    if ffmpeg is not None:
+        return FFmpegWriter(ffmpeg, path, fps, size, output_size, settings)
+
+    codec = OPENCV_FOURCCS.get(settings['codec'], settings['codec'])
+    out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*codec[:4].ljust(4)), fps, output_size)
+    if not out.isOpened() and codec != 'mp4v':
+        logger.warning(f"OpenCV cannot encode {codec} here, writing mp4v instead")
+        out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, output_size)
+    if out.isOpened() and settings['quality'] in QUALITY_LEVELS:
+        # Honoured by the codecs OpenCV exposes a quality for (MJPG), ignored by the others
+        out.set(cv2.VIDEOWRITER_PROP_QUALITY, QUALITY_LEVELS[settings['quality']][2])
+    if output_size != tuple(size):
+        return ResizingWriter(out, output_size)
+    return out
+
+
+def encoder_arguments(settings, size, output_size):
+    """ffmpeg output arguments encoding with the configured codec, quality, preset and threads"""
+    encoder, pix_fmt = FFMPEG_CODECS.get(settings['codec'], (settings['codec'], 'yuv420p'))
+    crf, qscale, _ = QUALITY_LEVELS.get(settings['quality'], QUALITY_LEVELS['high'])
+
+    arguments = []
+    if tuple(output_size) != tuple(size):
+        arguments += ['-vf', f'scale={output_size[0]}:{output_size[1]}']
+    arguments += ['-c:v', encoder, '-threads', str(settings['threads'])]
+    if encoder in ('libx264', 'libx265'):
+        arguments += ['-preset', settings['preset'], '-crf', str(crf)]
+    elif encoder == 'libvpx-vp9':
+        arguments += ['-crf', str(crf + 13), '-b:v', '0', '-row-mt', '1']
+    elif encoder in ('mpeg4', 'mjpeg'):
+        arguments += ['-q:v', str(qscale)]
+    if encoder == 'mpeg4':
+        # Same fourcc as OpenCV's mp4v output
+        arguments += ['-tag:v', 'mp4v']
+    if pix_fmt:
+        arguments += ['-pix_fmt', pix_fmt]
+    return arguments
+
+
+class ScaledCapture:
+    """cv2.VideoCapture wrapper resizing every frame to size"""
+
+    def __init__(self, cap, size):
+        self.cap = cap
+        self.size = size
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.size[0]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.size[1]
+        return self.cap.get(prop)
+
+    def read(self, frame=None):
+        ret, decoded = self.cap.read()
+        if not ret:
+            return False, None
+        return True, cv2.resize(decoded, self.size, dst=frame, interpolation=cv2.INTER_AREA)
+
+    def release(self):
+        self.cap.release()
+
+
+class ResizingWriter:
+    """Writer wrapper resizing frames to size into one reused buffer"""
+
+    def __init__(self, out, size):
+        self.out = out
+        self.size = size
+        self.buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+
+    def isOpened(self):
+        return self.out.isOpened()
+
+    def write(self, frame):
+        self.out.write(cv2.resize(frame, self.size, dst=self.buffer, interpolation=cv2.INTER_AREA))
+
+    def release(self):
+        self.out.release()
+
+
+class FFmpegReader:
+    """Raw BGR frames from an ffmpeg decode process, read straight into reused NumPy buffers"""
+
+    def __init__(self, ffmpeg, path, fps, frame_count, size, threads=0, buffers=4):
+        self.fps = fps
+        self.frame_count = frame_count
+        self.size = size
+        width, height = size
+        self.buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(max(2, buffers))]
+        self.views = [memoryview(buffer).cast('B') for buffer in self.buffers]
+        self.index = 0
+        self.stderr = tempfile.TemporaryFile()
+
+        command = [ffmpeg, '-v', 'error', '-nostdin', '-threads', str(threads), '-i', str(path), '-an', '-sn', '-dn',
+                   '-vf', f'scale={width}:{height}', '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-']
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=self.stderr,
+                                        bufsize=width * height * 3)
+
+    def isOpened(self):
+        return self.process is not None
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_FRAME_COUNT: self.frame_count,
+                cv2.CAP_PROP_FRAME_WIDTH: self.size[0], cv2.CAP_PROP_FRAME_HEIGHT: self.size[1]}.get(prop, 0.0)
+
+    def read(self, frame=None):
+        """(True, frame) with the next frame, decoded into frame when given, else into the next ring buffer"""
+        if self.process is None:
+            return False, None
+        if frame is None:
+            frame, view = self.buffers[self.index], self.views[self.index]
+            self.index = (self.index + 1) % len(self.buffers)
+        else:
+            view = memoryview(frame).cast('B')
+
+        filled = 0
+        while filled < len(view):
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                if filled:
+                    logger.warning("ffmpeg decode ended inside a frame, dropping it")
+                return False, None
+            filled += count
+        return True, frame
+
+    def release(self):
+        if self.process is None:
+            return
+        self.process.stdout.close()
+        if self.process.poll() is None:
+            self.process.terminate()
+        self.process.wait()
+        self.stderr.seek(0)
+        errors = self.stderr.read().decode(errors='replace').strip()
+        if errors and self.process.returncode not in (0, -15):
+            logger.error(f"ffmpeg decode: {errors}")
+        self.stderr.close()
+        self.process = None
+
+
+class FFmpegWriter:
+    """Encodes raw BGR frames piped to an ffmpeg process"""
+
+    def __init__(self, ffmpeg, path, fps, size, output_size, settings):
+        width, height = size
+        command = [ffmpeg, '-v', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}',
+                   '-framerate', str(fps or 30), '-i', '-']
+        command += encoder_arguments(settings, size, output_size)
+        command.append(str(path))
+
+        self.path = path
+        self.frame_bytes = width * height * 3
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self.stderr)
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() is None
+
+    def write(self, frame):
+        if frame.nbytes != self.frame_bytes:
+            raise ValueError(f"Frame of {frame.shape} does not match the encoder input size")
+        try:
+            self.process.stdin.write(memoryview(np.ascontiguousarray(frame)).cast('B'))
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpeg encoder exited: {self._errors()}")
+
+    def release(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.process.wait()
+        if self.process.returncode != 0:
+            logger.error(f"ffmpeg encode of {self.path} failed: {self._errors()}")
+        self.stderr.close()
+        self.process = None
+
+    def _errors(self):
+        self.stderr.seek(0)
+        return self.stderr.read().decode(errors='replace').strip()
@@ -1,14 +1,38 @@
 import logging
+import time
+from collections import deque
+from pathlib import Path
 
 import cv2
 
+from src.core.candidate_sidecar import CandidateSidecarReader, CandidateSidecarWriter, sidecar_path
+from src.core.detection import detections_from_array, speed_limit_table
+from src.core.frame_pipeline import ThreadedFramePipeline
+from src.core.live_source import LatencyStats, LatestFrameGrabber, open_live_source
+from src.core.motion_gate import MotionGatedDetector
+from src.core.ops import filter_candidates
+from src.core.process_pipeline import ProcessVideoPipeline
+from src.core.quality_controller import AdaptiveQualityDetector, QualityController
+from src.core.roi import RegionOfInterestDetector
+from src.core.segment_pipeline import SegmentVideoPipeline, plan_segments
+from src.core.tracker import TrackingDetector
+from src.core.video_io import open_video_reader, open_video_writer, video_settings
+
 logger = logging.getLogger(__name__)
 
 class VideoProcessor:
 
     def __init__(self, detector):
+        # Video frames never repeat, the detection cache only serves them with processing.detection_cache_video
+        if not detector.config.get('processing', {}).get('detection_cache_video', False):
+            detector = detector.without_cache()
         self.detector = detector
         self.log_callback = None
+        self.stats = {}
+        self.tracking = None
+        self.motion_gate = None
+        self.quality = None
+        self.roi = None
 
     def set_log_callback(self, callback):
         self.log_callback = callback
@@ -17,8 +41,28 @@ class VideoProcessor:
         if self.log_callback:
             self.log_callback(message, level)
 
-    def process_video(self, input_path, output_path, progress_callback=None):
-        cap = cv2.VideoCapture(input_path)
+    def process_video(self, input_path, output_path=None, progress_callback=None, detections_callback=None,
+                      stop_event=None):
+        """Run detection over a video, writing annotated frames to output_path.
+
+        Without output_path nothing is drawn or encoded, only detections and
+        stats are produced. detections_callback(frame_index, detections) is
+        called for every frame, except in the multiprocess pipeline (in
+        frame order after all segments finish in the segments pipeline).
+        Setting stop_event stops the sequential and threaded pipelines after
+        the current frame, and process_video returns False.
+        """
+        processing = self.detector.config.get('processing', {})
+        mode = processing.get('pipeline_mode', 'sequential')
+        batch_size = self.detector.get_batch_size()
+
+        if mode in ('segments', 'multiprocess'):
+            # Their workers decode on their own, video.io_backend and decode scaling do not apply
+            cap = cv2.VideoCapture(input_path)
+        else:
+            # Frames in flight: the batch, plus both queues of the threaded pipeline
+            in_flight = batch_size + (2 * processing.get('queue_size', 8) if mode == 'threaded' else 0)
+            cap = open_video_reader(input_path, self.detector.config, buffers=in_flight + 4)
 
         if not cap.isOpened():
             self._log(f"Cannot open video: {input_path}", "ERROR")
@@ -29,28 +73,66 @@ class VideoProcessor:
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        candidates_path = self._sidecar_target(input_path, mode)
 
-        if not out.isOpened():
-            self._log(f"Cannot create output video: {output_path}", "ERROR")
+        if mode == 'segments':
             cap.release()
-            return False
+            return self._process_video_segments(input_path, output_path, fps, width, height, total_frames,
+                                                progress_callback, candidates_path, detections_callback)
 
-        self._log(f"Processing video: {width}x{height} @ {fps}fps, {total_frames} frames", "INFO")
+        if mode == 'multiprocess':
+            cap.release()
+            if detections_callback is not None:
+                self._log("Per-frame detections are not reported by the multiprocess pipeline", "WARNING")
+            return self._process_video_multiprocess(input_path, output_path, fps, width, height, total_frames,
+                                                    progress_callback, candidates_path)
+
+        render = output_path is not None
+        out = None
+        if render:
+            out = open_video_writer(output_path, fps, (width, height), self.detector.config)
+
+            if not out.isOpened():
+                self._log(f"Cannot create output video: {output_path}", "ERROR")
+                cap.release()
+                return False
+
+        settings = video_settings(self.detector.config)
+        self._log(f"Processing video: {width}x{height} @ {fps}fps, {total_frames} frames, batch size {batch_size}, "
+                  f"{mode} pipeline{'' if render else ', no annotated output'}, "
+                  f"{type(cap).__name__} -> {settings['codec']} ({settings['quality']})", "INFO")
+
+        sidecar = None
+        if candidates_path is not None:
+            sidecar = CandidateSidecarWriter.for_detector(candidates_path, self.detector, input_path, width, height)
+            self._log(f"Saving raw candidates to {candidates_path}", "INFO")
+
+        pipeline = None
+        if mode == 'threaded':
+            pipeline = ThreadedFramePipeline(cap, out, processing.get('queue_size', 8))
+            pipeline.start()
+            frames = pipeline.frames()
+            write = pipeline.write
+        else:
+            frames = self._read_frames(cap)
+            write = out.write if render else None
 
         frame_count = 0
         detection_count = 0
+        self.stats = {'mode': mode, 'frames': 0, 'detections': 0}
+        start_time = time.perf_counter()
 
         try:
-            while True:
-                ret, frame = cap.read()
-
-                if not ret:
-                    break
-
-                annotated_frame, detections = self.detector.detect(frame)
-                out.write(annotated_frame)
+            # Decoded frames are not needed after they are written, so they are annotated in place
+            for annotated_frame, detections in self.iter_frame_results(frames, batch_size, render, in_place=True,
+                                                                       sidecar=sidecar):
+                if stop_event is not None and stop_event.is_set():
+                    self._log(f"Stopped after {frame_count}/{total_frames} frames", "WARNING")
+                    return False
+                if render:
+                    write(annotated_frame)
+                if detections_callback is not None:
+                    detections_callback(frame_count, detections)
 
                 frame_count += 1
                 detection_count += len(detections)
@@ -60,15 +142,425 @@ class VideoProcessor:
                     progress_callback(progress)
 
                 if frame_count % 100 == 0:
-                    self._log(f"Processed {frame_count}/{total_frames} frames, {detection_count} detections", "INFO")
+                    queue_text = ""
+                    if pipeline:
+                        depths = pipeline.queue_depths()
+                        queue_text = (f", queues decode={depths['decode']}/{pipeline.queue_size} "
+                                      f"encode={depths['encode']}/{pipeline.queue_size}")
+                    self._log(f"Processed {frame_count}/{total_frames} frames, {detection_count} detections{queue_text}",
+                              "INFO")
 
-            self._log(f"Successfully processed {frame_count} frames with {detection_count} total detections", "SUCCESS")
+            if pipeline:
+                pipeline.finish()
+                self.stats['peak_queue_depths'] = dict(pipeline.peak_depths)
+                self._log(f"Peak queue depths: decode={pipeline.peak_depths['decode']}, "
+                          f"encode={pipeline.peak_depths['encode']} (max {pipeline.queue_size})", "INFO")
+
+            self.stats.update(self.analysis_stats())
+            self._log_success(frame_count, detection_count, time.perf_counter() - start_time)
             return True
 
         except Exception as e:
             self._log(f"Error during video processing: {e}", "ERROR")
             return False
 
+        finally:
+            if pipeline:
+                pipeline.stop()
+            if sidecar is not None:
+                sidecar.close()
+            cap.release()
+            if out is not None:
+                out.release()
+
+    def _process_video_multiprocess(self, input_path, output_path, fps, width, height, total_frames,
+                                    progress_callback=None, candidates_path=None):
+        processing = self.detector.config.get('processing', {})
+        batch_size = self.detector.get_batch_size()
+        pipeline = ProcessVideoPipeline(self.detector.model_path, self.detector.config, batch_size,
+                                        processing.get('shared_slots', 16), candidates_path)
+
+        self._log(f"Processing video: {width}x{height} @ {fps}fps, {total_frames} frames, batch size {batch_size}, "
+                  f"multiprocess pipeline with {pipeline.slots} shared frame slots", "INFO")
+        if candidates_path is not None:
+            self._log(f"Saving raw candidates to {candidates_path}", "INFO")
+        self.stats = {'mode': 'multiprocess', 'frames': 0, 'detections': 0}
+
+        def on_progress(frame_count, detection_count):
+            if progress_callback and total_frames > 0:
+                progress_callback(int((frame_count / total_frames) * 100))
+            if frame_count % 100 == 0:
+                self._log(f"Processed {frame_count}/{total_frames} frames, {detection_count} detections", "INFO")
+
+        start_time = time.perf_counter()
+        try:
+            frame_count, detection_count = pipeline.run(input_path, output_path, fps, width, height, on_progress)
+        except Exception as e:
+            self._log(f"Error during video processing: {e}", "ERROR")
+            return False
+
+        self.stats.update(pipeline.stats)
+        self._log_success(frame_count, detection_count, time.perf_counter() - start_time)
+        return True
+
+    def _process_video_segments(self, input_path, output_path, fps, width, height, total_frames,
+                                progress_callback=None, candidates_path=None, detections_callback=None):
+        processing = self.detector.config.get('processing', {})
+        pipeline = SegmentVideoPipeline(self.detector.model_path, self.detector.config,
+                                        processing.get('segment_workers', 0),
+                                        processing.get('min_segment_frames', 300), candidates_path)
+        segments = plan_segments(total_frames, pipeline.workers, pipeline.min_segment_frames)
+
+        self._log(f"Processing video: {width}x{height} @ {fps}fps, {total_frames} frames, "
+                  f"{len(segments)} segments on {min(pipeline.workers, len(segments))} workers", "INFO")
+        if processing.get('tracking_enabled', False) or processing.get('motion_gating', False):
+            self._log("Tracks and motion gating restart at every segment boundary", "INFO")
+        if candidates_path is not None:
+            self._log(f"Saving raw candidates to {candidates_path}", "INFO")
+        self.stats = {'mode': 'segments', 'frames': 0, 'detections': 0}
+
+        def on_progress(frame_count, detection_count):
+            if progress_callback and total_frames > 0:
+                progress_callback(min(100, int((frame_count / total_frames) * 100)))
+
+        start_time = time.perf_counter()
+        try:
+            frame_count, detection_count = pipeline.run(input_path, output_path, fps, width, height, total_frames,
+                                                        on_progress, detections_callback)
+        except Exception as e:
+            self._log(f"Error during video processing: {e}", "ERROR")
+            return False
+
+        self.stats.update(pipeline.stats)
+        if 'join' in pipeline.stats:
+            self._log(f"Joined {pipeline.stats['segments']} segments with {pipeline.stats['join']}", "INFO")
+        self._log_success(frame_count, detection_count, time.perf_counter() - start_time)
+        return True
+
+    def process_live(self, source, output_path=None, duration=None, stop_event=None, replay=True,
+                     detections_callback=None, report_interval=5.0):
+        """Run detection on a live source (camera index, stream URL, named pipe) until it ends or is stopped.
+
+        Capture runs on its own thread and only the freshest frame is
+        processed, frames that arrive while the detector is busy are dropped.
+        A video file is replayed at its native FPS as a stand-in for a camera
+        (replay=False reads it as fast as possible). Capture-to-result latency
+        percentiles are reported against processing.fps_target.
+        detections_callback(frame_index, detections) receives the capture
+        index of every processed frame.
+        """
+        cap, pace_fps = open_live_source(source, replay)
+        if not cap.isOpened():
+            self._log(f"Cannot open live source: {source}", "ERROR")
+            return False
+
+        processing = self.detector.config.get('processing', {})
+        fps_target = processing.get('fps_target') or 30
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or fps_target
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        render = output_path is not None
+        out = None
+        if render:
+            # Dropped frames are not written, the recording plays faster than real time under load
+            out = open_video_writer(output_path, source_fps, (width, height), self.detector.config)
+            if not out.isOpened():
+                self._log(f"Cannot create output video: {output_path}", "ERROR")
+                cap.release()
+                return False
+
+        self._log(f"Live source {source}: {width}x{height} @ {source_fps:.0f}fps"
+                  f"{' (replayed at native FPS)' if pace_fps else ''}, target {fps_target} FPS", "INFO")
+
+        grabber = LatestFrameGrabber(cap, pace_fps).start()
+        latency = LatencyStats(fps_target)
+        pending = deque()
+        start_time = time.perf_counter()
+        deadline = start_time + duration if duration else None
+
+        def frames():
+            while not (stop_event is not None and stop_event.is_set()):
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                item = grabber.latest(timeout=0.5)
+                if item is None:
+                    if grabber.finished:
+                        return
+                    continue
+                index, captured_at, frame = item
+                pending.append((index, captured_at))
+                yield frame
+
+        frame_count = 0
+        detection_count = 0
+        self.stats = {'mode': 'live', 'frames': 0, 'detections': 0}
+        next_report = start_time + report_interval
+
+        try:
+            # One frame per inference, batching would add its fill time to the latency
+            # Adaptive quality follows the capture-to-result latency, not the time spent waiting for frames
+            for annotated_frame, detections in self.iter_frame_results(frames(), 1, render, in_place=True,
+                                                                       measure_frames=False):
+                index, captured_at = pending.popleft()
+                frame_latency = time.perf_counter() - captured_at
+                latency.add(frame_latency)
+                if self.quality is not None:
+                    self.quality.record(frame_latency)
+                if detections_callback is not None:
+                    detections_callback(index, detections)
+                if render:
+                    out.write(annotated_frame)
+
+                frame_count += 1
+                detection_count += len(detections)
+
+                now = time.perf_counter()
+                if now >= next_report:
+                    self._log_live_report(frame_count / (now - start_time), fps_target, latency.summary(),
+                                          grabber.dropped, grabber.captured)
+                    next_report = now + report_interval
+
+            elapsed = time.perf_counter() - start_time
+            summary = latency.summary()
+            self.stats.update(self.analysis_stats())
+            self.stats.update(captured=grabber.captured, dropped=grabber.dropped, fps_target=fps_target,
+                              latency=summary)
+            self._log_live_report(frame_count / elapsed if elapsed > 0 else 0.0, fps_target, summary,
+                                  grabber.dropped, grabber.captured)
+            self._log_success(frame_count, detection_count, elapsed)
+            return True
+
+        except Exception as e:
+            self._log(f"Error during live processing: {e}", "ERROR")
+            return False
+
+        finally:
+            grabber.stop()
+            if out is not None:
+                out.release()
+
+    def _log_live_report(self, fps, fps_target, latency, dropped, captured):
+        if not latency:
+            self._log(f"Live: no frames processed, {captured} captured", "WARNING")
+            return
+        level = "INFO" if fps >= fps_target * 0.95 and latency['p99_ms'] <= latency['budget_ms'] else "WARNING"
+        self._log(f"Live: {fps:.1f} FPS (target {fps_target}), latency p50 {latency['p50_ms']:.1f} / "
+                  f"p90 {latency['p90_ms']:.1f} / p99 {latency['p99_ms']:.1f} ms (budget {latency['budget_ms']:.1f} ms, "
+                  f"{latency['over_budget']:.0%} over), dropped {dropped}/{captured} frames", level)
+
+    def iter_frame_results(self, frames, batch_size=None, render=True, in_place=False, sidecar=None,
+                           measure_frames=True):
+        """(annotated, detections) per frame, through regions of interest, adaptive quality, motion gating and/or
+        the tracker when enabled.
+
+        annotated is None when render is False. With a sidecar writer every
+        frame is inferred and its raw candidates are recorded. With
+        processing.adaptive_quality the controller times every frame unless
+        measure_frames is False, the caller then feeds self.quality.record().
+        """
+        processing = self.detector.config.get('processing', {})
+        detector = self.detector
+        self.tracking = None
+        self.motion_gate = None
+        self.quality = None
+        self.roi = None
+
+        if sidecar is not None:
+            return self._iter_recorded_results(frames, batch_size, render, in_place, sidecar)
+
+        if processing.get('roi_enabled', False):
+            self.roi = RegionOfInterestDetector.from_config(self.detector)
+            detector = self.roi
+
+        adaptive = None
+        if processing.get('adaptive_quality', False):
+            self.quality = QualityController.from_config(self.detector.config, self._log)
+            adaptive = AdaptiveQualityDetector(detector, self.quality)
+            detector = adaptive
+
+        if processing.get('motion_gating', False):
+            self.motion_gate = MotionGatedDetector.from_config(detector)
+            detector = self.motion_gate
+
+        if processing.get('tracking_enabled', False):
+            self.tracking = TrackingDetector.from_config(detector)
+            results = self.tracking.iter_detect(frames, render, in_place)
+        elif self.motion_gate is not None:
+            results = self.motion_gate.iter_detect(frames, render, in_place)
+        elif adaptive is not None:
+            results = adaptive.iter_detect(frames, render, in_place)
+        elif self.roi is not None:
+            results = self.roi.iter_detect(frames, render, in_place)
+        else:
+            return self.detector.iter_detect_batch(frames, batch_size, render=render, in_place=in_place)
+
+        if adaptive is None:
+            return results
+        return self._iter_adaptive_results(results, adaptive, measure_frames)
+
+    def _iter_adaptive_results(self, results, adaptive, measure_frames):
+        try:
+            yield from self.quality.monitor(results) if measure_frames else results
+        finally:
+            adaptive.restore()
+
+    def _iter_recorded_results(self, frames, batch_size, render, in_place, sidecar):
+        if batch_size is None:
+            batch_size = self.detector.get_batch_size()
+
+        batch = []
+        for frame in frames:
+            batch.append(frame)
+            if len(batch) >= batch_size:
+                yield from self._record_batch(batch, render, in_place, sidecar)
+                batch = []
+
+        if batch:
+            yield from self._record_batch(batch, render, in_place, sidecar)
+
+    def _record_batch(self, frames, render, in_place, sidecar):
+        for frame, candidates in zip(frames, self.detector.detect_candidates(frames)):
+            sidecar.write(candidates)
+            result = None
+            if candidates is not None:
+                result = self.detector.refilter(frame, candidates, render=render, in_place=in_place)
+            if result is None:
+                result = self.detector.detect(frame, render=render, in_place=in_place)
+            yield result
+
+    def _sidecar_target(self, input_path, mode='sequential'):
+        """Sidecar path when processing.save_candidates is on, None otherwise"""
+        processing = self.detector.config.get('processing', {})
+        if not processing.get('save_candidates', False):
+            return None
+        if video_settings(self.detector.config)['decode_width'] and mode not in ('segments', 'multiprocess'):
+            self._log("Raw candidates are re-rendered on the full-resolution video, not saved with "
+                      "video.decode_width", "WARNING")
+            return None
+        if any(processing.get(key, False) for key in ('tracking_enabled', 'motion_gating', 'adaptive_quality',
+                                                      'roi_enabled')):
+            self._log("Raw candidates need full-frame inference on every frame, not saved with tracking, "
+                      "motion gating, adaptive quality or regions of interest", "WARNING")
+            return None
+        return sidecar_path(input_path)
+
+    def rerender_video(self, input_path, output_path, candidates_path=None, progress_callback=None):
+        """Redraw a processed video at the current thresholds from its candidate sidecar, without inference"""
+        candidates_path = Path(candidates_path) if candidates_path else sidecar_path(input_path)
+        if not candidates_path.exists():
+            self._log(f"No candidate sidecar found: {candidates_path}, process the video with "
+                      f"processing.save_candidates first", "ERROR")
+            return False
+
+        conf, iou, max_det = self.detector.inference_parameters()
+        reader = CandidateSidecarReader(candidates_path)
+        if conf < reader.header.get('floor', 0.0):
+            self._log(f"Confidence {conf:.2f} is below the recorded candidate floor {reader.header['floor']}, "
+                      f"process the video again", "ERROR")
+            reader.close()
+            return False
+
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            self._log(f"Cannot open video: {input_path}", "ERROR")
+            reader.close()
+            return False
+
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        out = open_video_writer(output_path, fps, (width, height), self.detector.config)
+        if not out.isOpened():
+            self._log(f"Cannot create output video: {output_path}", "ERROR")
+            cap.release()
+            reader.close()
+            return False
+
+        labels = speed_limit_table(reader.class_names)
+        self._log(f"Re-rendering {total_frames} frames from {candidates_path.name} at "
+                  f"Conf={conf:.2f}, IoU={iou:.2f}", "INFO")
+        self.stats = {'mode': 'rerender', 'frames': 0, 'detections': 0}
+
+        frame_count = 0
+        detection_count = 0
+        start_time = time.perf_counter()
+        try:
+            records = reader.frames()
+            for frame in self._read_frames(cap):
+                candidates = next(records, None)
+                detections = []
+                if candidates is not None:
+                    prediction = filter_candidates(candidates.rows, candidates.transform, conf, iou, max_det)
+                    detections = detections_from_array(prediction, labels)
+
+                out.write(self.detector.annotate(frame, detections, in_place=True))
+                frame_count += 1
+                detection_count += len(detections)
+
+                if progress_callback and total_frames > 0 and frame_count % 10 == 0:
+                    progress_callback(int((frame_count / total_frames) * 100))
+
+            self._log_success(frame_count, detection_count, time.perf_counter() - start_time)
+            return True
+
+        except Exception as e:
+            self._log(f"Error during re-rendering: {e}", "ERROR")
+            return False
+
         finally:
             cap.release()
             out.release()
+            reader.close()
+
+    def analysis_stats(self):
+        """Inference/skip counters of the tracker and motion gate used by the last run.
+
+        The tracker wraps the motion gate, so tracker_inferences counts the
+        frames the tracker sent on and gate_inferences the model runs left
+        after motion gating.
+        """
+        stats = {}
+        if self.tracking is not None:
+            stats.update(tracker_inferences=self.tracking.inference_count, tracks=self.tracking.tracker.next_id)
+        if self.motion_gate is not None:
+            stats.update(gate_inferences=self.motion_gate.inference_count, skipped=self.motion_gate.skipped_count)
+        if self.quality is not None:
+            stats.update(self.quality.stats())
+        if self.roi is not None:
+            stats.update(roi_pixel_fraction=self.roi.pixel_fraction(), roi_full_frames=self.roi.full_frame_count,
+                         roi_inferred_pixels=self.roi.inferred_pixels, roi_frame_pixels=self.roi.frame_pixels)
+        return stats
+
+    def _log_analysis_stats(self, stats, frame_count):
+        if 'tracks' in stats:
+            self._log(f"Tracking: {stats['tracks']} tracks, detected on {stats['tracker_inferences']}/{frame_count} "
+                      f"frames", "INFO")
+        if 'skipped' in stats:
+            self._log(f"Motion gating: ran {stats['gate_inferences']} inferences, skipped {stats['skipped']}", "INFO")
+        if 'roi_pixel_fraction' in stats:
+            self._log(f"Regions of interest: inferred {stats['roi_pixel_fraction']:.0%} of the frame pixels, "
+                      f"{stats['roi_full_frames']} full frames", "INFO")
+        if 'quality_adjustments' in stats:
+            per_segment = ''
+            if len(stats.get('segment_input_sizes', ())) > 1:
+                per_segment = f" (segments ended at {', '.join(map(str, stats['segment_input_sizes']))})"
+            self._log(f"Adaptive quality: {stats['quality_adjustments']} adjustments, ended at input size "
+                      f"{stats['input_size']} with detection stride {stats['detect_stride']}{per_segment}", "INFO")
+
+    def _log_success(self, frame_count, detection_count, elapsed):
+        fps = frame_count / elapsed if elapsed > 0 else 0.0
+        self.stats.update(frames=frame_count, detections=detection_count, seconds=elapsed, fps=fps)
+        self._log_analysis_stats(self.stats, frame_count)
+        self._log(f"Successfully processed {frame_count} frames with {detection_count} total detections "
+                  f"in {elapsed:.1f}s ({fps:.1f} FPS)", "SUCCESS")
+
+    @staticmethod
+    def _read_frames(cap):
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
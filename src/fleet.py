@@ -0,0 +1,227 @@
+"""
+Coordinator / Worker Distribution of Video Backlogs over a Shared SQLite Task Queue
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.batch_detect import collect_inputs, output_paths
+from src.core.detector import SpeedSignDetector
+from src.core.task_queue import DONE, FAILED, LEASED, PENDING, TaskQueue
+from src.core.video_processor import VideoProcessor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = {'ERROR': logging.ERROR, 'WARNING': logging.WARNING}
+
+
+def _queue(args):
+    return TaskQueue(args.queue, max_attempts=args.max_attempts)
+
+
+def coordinator(args):
+    """Queue the videos of the inputs, and with --watch keep queueing new arrivals and reporting progress"""
+    queue = _queue(args)
+    while True:
+        _, videos = collect_inputs(args.inputs, args.recursive)
+        added = queue.enqueue([(video.resolve(), relative) for video, relative in videos], Path(args.output).resolve())
+        expired = queue.requeue_expired()
+        if added or expired:
+            logger.info(f"Queued {added} new videos, requeued {expired} expired leases")
+
+        counts = queue.counts()
+        logger.info(f"Tasks: {counts[PENDING]} pending, {counts[LEASED]} running, {counts[DONE]} done, "
+                    f"{counts[FAILED]} failed")
+        if not args.watch:
+            return 0
+        time.sleep(args.watch)
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps a task lease alive while the video is processed, setting lost when another worker took it over"""
+
+    def __init__(self, queue, task_id, worker, lease_seconds):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.task_id = task_id
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.stop_event = threading.Event()
+        self.lost = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.task_id, self.worker, self.lease_seconds):
+                    logger.warning(f"Lost the lease on task {self.task_id}, stopping")
+                    self.lost.set()
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat failed: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+def _outputs(task, worker_id):
+    """[(temporary, final)] output paths of a task. The temporary ones are unique to the worker, so a worker that
+    lost its lease never writes over the outputs of the one that took the task over."""
+    source = Path(task['source'])
+    tag = re.sub(r'[^\w.-]', '_', worker_id)
+    return [(path.with_name(f"{path.stem}.part-{tag}{path.suffix}"), path)
+            for path in output_paths(task['output_dir'], task.get('output_name') or source.name)]
+
+
+def _discard(outputs):
+    for temporary, _ in outputs:
+        temporary.unlink(missing_ok=True)
+
+
+def _process(processor, task, outputs, stop_event):
+    (output_path, _), (detections_path, _) = outputs
+
+    with open(detections_path, 'w') as f:
+        def write_frame(index, detections):
+            f.write(json.dumps({'frame': index, 'detections': [d.to_dict() for d in detections]}) + '\n')
+
+        success = processor.process_video(task['source'], str(output_path), detections_callback=write_frame,
+                                          stop_event=stop_event)
+    if not success:
+        raise RuntimeError("process_video failed, see the worker log")
+    return dict(processor.stats)
+
+
+def worker(args):
+    """Claim, process and complete tasks until the queue is empty (or forever with --wait)"""
+    queue = _queue(args)
+    worker_id = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+    config = SpeedSignDetector._load_config(args.config)
+    processing = config.setdefault('processing', {})
+    if processing.get('pipeline_mode') == 'multiprocess':
+        # The per-frame detection stream is not reported by the multiprocess pipeline
+        processing['pipeline_mode'] = 'threaded'
+    detector = SpeedSignDetector(model_path=args.model, config=config)
+    if not detector.is_model_loaded():
+        return 1
+
+    processor = VideoProcessor(detector)
+    processor.set_log_callback(lambda message, level="INFO": logger.log(LOG_LEVELS.get(level, logging.INFO), message))
+
+    done = 0
+    logger.info(f"Worker {worker_id} polling {args.queue}")
+    while args.max_tasks is None or done < args.max_tasks:
+        task = queue.claim(worker_id, args.lease)
+        if task is None:
+            # Leased tasks may still expire and come back, only an idle queue ends the run
+            if not args.wait and queue.counts()[LEASED] == 0:
+                break
+            time.sleep(args.poll)
+            continue
+
+        logger.info(f"Task {task['id']} (attempt {task['attempts']}): {task['source']}")
+        heartbeat = _Heartbeat(queue, task['id'], worker_id, args.lease)
+        heartbeat.start()
+        outputs = _outputs(task, worker_id)
+        try:
+            result = _process(processor, task, outputs, heartbeat.lost)
+        except Exception as e:
+            heartbeat.stop()
+            _discard(outputs)
+            if heartbeat.lost.is_set():
+                logger.warning(f"Task {task['id']} was taken over after its lease expired, stopped")
+            else:
+                logger.error(f"Task {task['id']} failed: {e}")
+                queue.fail(task['id'], worker_id, e)
+            continue
+        heartbeat.stop()
+
+        result['worker'] = worker_id
+        if queue.complete(task['id'], worker_id, result):
+            for temporary, final in outputs:
+                os.replace(temporary, final)
+            done += 1
+            logger.info(f"Task {task['id']} done: {result.get('frames', 0)} frames at {result.get('fps', 0.0):.1f} FPS")
+        else:
+            _discard(outputs)
+            logger.warning(f"Task {task['id']} was taken over after its lease expired, result discarded")
+
+    logger.info(f"Worker {worker_id} finished {done} tasks")
+    return 0
+
+
+def status(args):
+    queue = _queue(args)
+    counts = queue.counts()
+    print(f"\n{counts[PENDING]} pending, {counts[LEASED]} running, {counts[DONE]} done, {counts[FAILED]} failed\n")
+
+    done = queue.tasks(DONE)
+    if done:
+        results = [json.loads(task['result']) for task in done]
+        frames = sum(result.get('frames', 0) for result in results)
+        span = max(task['finished'] for task in done) - min(task['started'] for task in done)
+        per_worker = Counter(result.get('worker') for result in results)
+        print(f"Fleet throughput: {len(done) / span * 3600 if span > 0 else 0.0:.1f} videos/h, "
+              f"{frames / span if span > 0 else 0.0:.1f} frames/s over {span:.0f}s")
+        print(f"{'Worker':<32} {'Videos':>7}")
+        for worker_id, count in per_worker.most_common():
+            print(f"{worker_id:<32} {count:>7}")
+        print()
+
+    for task in queue.tasks(LEASED):
+        print(f"running  {task['worker']:<32} {Path(task['source']).name} (lease {task['lease_expires'] - time.time():.0f}s)")
+    for task in queue.tasks(FAILED):
+        print(f"failed   {Path(task['source']).name}: {task['error']}")
+    return 0
+
+
+def retry(args):
+    logger.info(f"Requeued {_queue(args).retry_failed()} failed tasks")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribute video processing over workers on any number of hosts")
+    parser.add_argument('--queue', default='cache/tasks.sqlite', help="Task queue file, on storage every host shares")
+    parser.add_argument('--max-attempts', type=int, default=3)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    coordinator_parser = subparsers.add_parser('coordinator', help="Queue videos for the workers")
+    coordinator_parser.add_argument('inputs', nargs='+', help="Video files, directories or glob patterns")
+    coordinator_parser.add_argument('--output', default='datasets/test_videos/output')
+    coordinator_parser.add_argument('--recursive', action='store_true')
+    coordinator_parser.add_argument('--watch', type=float, default=None,
+                                    help="Rescan the inputs every N seconds and queue new videos")
+
+    worker_parser = subparsers.add_parser('worker', help="Process queued videos")
+    worker_parser.add_argument('--config', default='config/settings.yaml')
+    worker_parser.add_argument('--model', default=None, help="Model weights (default: model.yolo_model from config)")
+    worker_parser.add_argument('--worker-id', default=None, help="Default: <hostname>:<pid>")
+    worker_parser.add_argument('--lease', type=float, default=60.0, help="Lease seconds, renewed every third of it")
+    worker_parser.add_argument('--wait', action='store_true', help="Keep polling when the queue is empty")
+    worker_parser.add_argument('--poll', type=float, default=5.0, help="Seconds between polls for claimable tasks")
+    worker_parser.add_argument('--max-tasks', type=int, default=None)
+
+    subparsers.add_parser('status', help="Queue state and fleet throughput")
+    subparsers.add_parser('retry', help="Requeue failed tasks")
+
+    args = parser.parse_args()
+    return {'coordinator': coordinator, 'worker': worker, 'status': status, 'retry': retry}[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
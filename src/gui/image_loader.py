@@ -0,0 +1,142 @@
+"""
+Background image decoding and prefetch for image navigation
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from PIL import Image
+from PySide6.QtCore import QObject, Signal
+
+logger = logging.getLogger(__name__)
+
+REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def display_reduction(path, display_size):
+    """Largest IMREAD_REDUCED factor that still covers display_size, 1 for a full decode"""
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except Exception:
+        return 1
+
+    max_w, max_h = display_size
+    # Either orientation, EXIF rotation is applied by imread but not reflected in the header size
+    fit = max(min(max_w / width, max_h / height), min(max_w / height, max_h / width))
+    for factor in (8, 4, 2):
+        if fit * factor <= 1:
+            return factor
+    return 1
+
+
+class ImagePrefetcher(QObject):
+    """Decodes images on worker threads ahead of navigation.
+
+    Around the current index, the current image and its radius neighbours
+    are decoded at display resolution (reduced JPEG decode where the file is
+    much larger than the view), and the current image at full resolution for
+    detection. loaded(path, full) fires on the GUI thread once a decode is
+    ready, so the GUI never waits on disk or the decoder.
+
+    With a lookup set, the first full decode of each path is also looked up
+    in the on-disk detection cache on a worker thread, candidates_found(path,
+    raw) delivers the hits.
+    """
+
+    loaded = Signal(object, bool)
+    candidates_found = Signal(object, object)
+
+    def __init__(self, radius=2, workers=2):
+        super().__init__()
+        self.radius = radius
+        self.display_size = (1280, 720)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-prefetch")
+        self.futures = {}
+        self.lookup = None
+        self.looked_up = set()
+        self._lookup_lock = threading.Lock()
+
+    def prefetch(self, files, index):
+        """Queue decodes around index, current image first, and drop those that left the window"""
+        current = files[index]
+        window = [current] + [files[i] for offset in range(1, self.radius + 1)
+                              for i in (index + offset, index - offset) if 0 <= i < len(files)]
+
+        wanted = {(current, False), (current, True)} | {(path, False) for path in window}
+        for key in list(self.futures):
+            if key not in wanted:
+                self.futures.pop(key).cancel()
+
+        self._submit(current, False)
+        self._submit(current, True)
+        for path in window[1:]:
+            self._submit(path, False)
+
+    def display_image(self, path):
+        """(image, reduction) at display resolution if decoded, None while still loading or unreadable"""
+        future = self.futures.get((path, False))
+        if future is None or not future.done() or future.cancelled():
+            return None
+        return future.result()
+
+    def full_image(self, path, wait=True):
+        """Full-resolution image, decoded now if it was not prefetched; None when unreadable or not ready"""
+        future = self._submit(path, True)
+        if not wait and not future.done():
+            return None
+        image, _ = future.result()
+        return image
+
+    def clear(self):
+        for future in self.futures.values():
+            future.cancel()
+        self.futures = {}
+
+    def shutdown(self):
+        self.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, path, full):
+        key = (path, full)
+        future = self.futures.get(key)
+        if future is None or future.cancelled():
+            future = self.executor.submit(self._decode, path, full, self.display_size)
+            future.add_done_callback(lambda f: self._notify(f, path, full))
+            self.futures[key] = future
+        return future
+
+    @staticmethod
+    def _decode(path, full, display_size):
+        reduction = 1 if full else display_reduction(path, display_size)
+        image = cv2.imread(str(path), REDUCED_FLAGS.get(reduction, cv2.IMREAD_COLOR))
+        if image is None:
+            logger.warning(f"Cannot read image: {path}")
+            return None, reduction
+        return image, reduction
+
+    def _notify(self, future, path, full):
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.loaded.emit(path, full)
+
+        image = future.result()[0]
+        if full and image is not None and self.lookup is not None and path not in self.looked_up:
+            self.looked_up.add(path)
+            try:
+                self.executor.submit(self._lookup, path, image)
+            except RuntimeError:
+                pass  # shut down
+
+    def _lookup(self, path, image):
+        try:
+            # One cache connection, shared by the workers
+            with self._lookup_lock:
+                raw = self.lookup(image)
+        except Exception as e:
+            logger.warning(f"Detection cache lookup failed for {path}: {e}")
+            return
+        if raw is not None:
+            self.candidates_found.emit(path, raw)
@@ -5,8 +5,10 @@ Speed Limit Detection GUI
 import logging
 import shutil
 import sys
+import time
 import cv2
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
@@ -23,8 +25,10 @@ from PySide6.QtGui import QPixmap, QImage, QKeySequence, QShortcut, QDragEnterEv
 from src.core.detector import SpeedSignDetector
 from src.core.video_processor import VideoProcessor
 from src.gui.components import InfoBar, StatusBar, VideoControls
+from src.gui.image_loader import ImagePrefetcher
 from src.gui.log_widget import LogWidget
 from src.gui.parameter_widget import ParameterWidget
+from src.gui.result_cache import ImageResult, ResultCache
 from src.gui.styles import AppStyles
 
 logger = logging.getLogger(__name__)
@@ -54,6 +58,74 @@ class VideoProcessingThread(QThread):
             self.finished.emit(False, str(e))
 
 
+class ImageDetectionThread(QThread):
+    """Detects a list of image files in batches, decoding the next batch while the current one infers"""
+
+    result = Signal(object, object)
+    progress = Signal(int, int, float)
+    finished = Signal(bool, str)
+
+    def __init__(self, detector, image_files, preloaded=None):
+        super().__init__()
+        # Own session, thresholds stay at the values the job started with
+        self.detector = detector.session()
+        self.image_files = list(image_files)
+        self.preloaded = preloaded or {}
+        self.params = self.detector.inference_parameters()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            batch_size = self.detector.get_batch_size()
+            batches = [self.image_files[i:i + batch_size] for i in range(0, len(self.image_files), batch_size)]
+            total = len(self.image_files)
+            done = 0
+            start = time.perf_counter()
+
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="detect-decode") as pool:
+                pending = [pool.submit(self._load, f) for f in batches[0]] if batches else []
+                for index, batch in enumerate(batches):
+                    images = [future.result() for future in pending]
+                    if self.cancelled:
+                        break
+                    if index + 1 < len(batches):
+                        pending = [pool.submit(self._load, f) for f in batches[index + 1]]
+                    self._detect_batch(batch, images)
+                    done += len(batch)
+                    self.progress.emit(done, total, done / max(time.perf_counter() - start, 1e-9))
+
+            elapsed = time.perf_counter() - start
+            self.finished.emit(not self.cancelled,
+                               f"{done}/{total} images in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.1f} img/s)")
+        except Exception as e:
+            logger.error(f"Image detection thread error: {e}")
+            self.finished.emit(False, str(e))
+
+    def _load(self, image_file):
+        image = self.preloaded.get(image_file)
+        return image if image is not None else cv2.imread(str(image_file))
+
+    def _detect_batch(self, batch_files, batch_images):
+        readable = [(f, image) for f, image in zip(batch_files, batch_images) if image is not None]
+        for image_file, image in zip(batch_files, batch_images):
+            if image is None:
+                self.result.emit(image_file, None)
+        if not readable:
+            return
+
+        # Candidates are kept per image so threshold changes only re-filter them
+        candidates = self.detector.detect_candidates([image for _, image in readable])
+        for (image_file, image), raw in zip(readable, candidates):
+            entry = ImageResult(candidates=raw)
+            if raw is None or self.params[0] < raw.floor:
+                entry.detections = self.detector.detect(image, render=False)[1]
+                entry.params = self.params
+            self.result.emit(image_file, entry)
+
+
 class DropZoneLabel(QLabel):
 
     def __init__(self):
@@ -194,11 +266,16 @@ class SimpleDetectionApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.detector = None
-        self.video_processor = None
         self.image_files = []
         self.current_index = 0
-        self.current_image = None
-        self.cache = {}
+        self.cache = ResultCache()
+        self.cache_renders = True
+        self.prefetcher = ImagePrefetcher()
+        self.prefetcher.loaded.connect(self._on_image_loaded)
+        self.prefetcher.candidates_found.connect(self._on_candidates_found)
+        self.detection_thread = None
+        self.detection_target = None
+        self.detecting_all = False
         self.current_video_path = None
         self.video_thread = None
         self.video_player = None
@@ -304,6 +381,12 @@ class SimpleDetectionApp(QMainWindow):
         detect_btn.clicked.connect(self._detect_current)
         controls_layout.addWidget(detect_btn)
 
+        detect_all_btn = QPushButton("Detect All")
+        detect_all_btn.setStyleSheet(AppStyles.BUTTON)
+        detect_all_btn.clicked.connect(self._detect_all)
+        self.detect_all_btn = detect_all_btn
+        controls_layout.addWidget(detect_all_btn)
+
         layout.addLayout(controls_layout)
 
         self.info_bar = InfoBar()
@@ -364,10 +447,17 @@ class SimpleDetectionApp(QMainWindow):
     def _init_detector(self):
         try:
             self.detector = SpeedSignDetector()
-            self.video_processor = VideoProcessor(self.detector)
-            self.video_processor.set_log_callback(self.log_widget.add_log)
+
+            gui_config = self.detector.config.get('gui', {})
+            self.cache.max_bytes = int(gui_config.get('cache_memory_mb', 512) * 1024 * 1024)
+            self.cache_renders = gui_config.get('cache_renders', True)
+            self.prefetcher.radius = gui_config.get('prefetch_radius', 2)
 
             if self.detector.is_model_loaded():
+                if self.detector.detection_cache is not None:
+                    # Images detected in an earlier session, looked up on the prefetch threads
+                    lookup = self.detector.session()
+                    self.prefetcher.lookup = lambda image: lookup.detect_candidates([image], cached_only=True)[0]
                 self.status_bar.set_status("Model loaded successfully")
                 self.log_widget.add_log("Model loaded successfully", "SUCCESS")
             else:
@@ -383,12 +473,18 @@ class SimpleDetectionApp(QMainWindow):
             conf = params.get('confidence_threshold')
             iou = params.get('iou_threshold')
 
+            # Cached results at other thresholds are re-filtered from their candidates when shown
             self.detector.update_parameters(conf=conf, iou=iou)
-            self.cache = {}
 
             self.status_bar.set_status(f"Parameters updated: Conf={conf:.2f}, IoU={iou:.2f}")
             self.log_widget.add_log(f"Parameters updated: Conf={conf:.2f}, IoU={iou:.2f}", "INFO")
 
+            if self.image_files:
+                result = self._cached_result(self.image_files[self.current_index])
+                if result is not None:
+                    self._display_image(result[0], self.image_label)
+                    self._update_status(result[1])
+
     def _load_test_images(self):
         test_folder = Path("datasets/test_images")
         if test_folder.exists():
@@ -419,7 +515,6 @@ class SimpleDetectionApp(QMainWindow):
 
         if self.image_files:
             self.current_index = 0
-            self.cache = {}
             self.prev_btn.setEnabled(True)
             self.next_btn.setEnabled(True)
             self._show_current_image()
@@ -436,16 +531,44 @@ class SimpleDetectionApp(QMainWindow):
         current_file = self.image_files[self.current_index]
         self.info_bar.update_info(self.current_index, len(self.image_files), current_file.name)
 
-        self.current_image = cv2.imread(str(current_file))
+        # Decoding happens on the prefetcher threads, the image shows once loaded() fires
+        self.prefetcher.display_size = self._display_area()
+        self.prefetcher.prefetch(self.image_files, self.current_index)
+        self._refresh_current_image()
 
-        if self.current_image is not None:
-            if current_file in self.cache:
-                result_image, detections = self.cache[current_file]
-                self._display_image(result_image, self.image_label)
-                self._update_status(detections, cached=True)
-            else:
-                self._display_image(self.current_image, self.image_label)
-                self.status_bar.set_status("Press Space to detect")
+    def _refresh_current_image(self):
+        current_file = self.image_files[self.current_index]
+        decoded = self.prefetcher.display_image(current_file)
+        if decoded is None:
+            self.status_bar.set_status(f"Loading {current_file.name}...")
+            return
+        if decoded[0] is None:
+            self.status_bar.set_status(f"Cannot read {current_file.name}", "error")
+            return
+
+        result = self._cached_result(current_file)
+        if result is not None:
+            result_image, detections = result
+            self._display_image(result_image, self.image_label)
+            self._update_status(detections, cached=True)
+        else:
+            self._display_image(decoded[0], self.image_label)
+            self.status_bar.set_status("Press Space to detect")
+
+    def _on_image_loaded(self, image_file, full):
+        if not self.image_files or image_file != self.image_files[self.current_index]:
+            return
+        # The full-resolution decode is what results that arrived before any decode are drawn on
+        entry = self.cache.get(image_file)
+        if not full or entry is None or entry.render is None:
+            self._refresh_current_image()
+
+    def _on_candidates_found(self, image_file, raw):
+        if image_file in self.cache:
+            return
+        self._store_result(image_file, ImageResult(candidates=raw))
+        if self.image_files and image_file == self.image_files[self.current_index]:
+            self._refresh_current_image()
 
     @staticmethod
     def _display_image(cv_image, label_widget):
@@ -477,32 +600,197 @@ class SimpleDetectionApp(QMainWindow):
             self._show_current_image()
 
     def _detect_current(self):
-        if self.current_image is None or self.detector is None:
+        if not self.image_files or self.detector is None:
             return
 
         current_file = self.image_files[self.current_index]
 
-        if current_file in self.cache:
-            result_image, detections = self.cache[current_file]
+        result = self._cached_result(current_file)
+        if result is not None:
+            result_image, detections = result
             self._display_image(result_image, self.image_label)
             self._update_status(detections, cached=True)
             self.log_widget.add_log(f"Loaded cached detection for {current_file.name}", "INFO")
             return
+        entry = self.cache.get(current_file)
+        if entry is not None and entry.detections is not None and entry.params == self.detector.inference_parameters():
+            # Already detected, shown once the image is decoded
+            self.status_bar.set_status(f"Loading {current_file.name}...")
+            return
+
+        # The result is shown and logged when it arrives, if the image is still the current one
+        self.detection_target = current_file
+        if self._detection_running():
+            if current_file not in self.detection_thread.image_files:
+                self.status_bar.set_status("Detection running, press Space again when it finishes", "warning")
+            return
+
+        batch_files = self._collect_detection_batch(current_file)
 
         self.status_bar.set_status("Processing...")
-        self.log_widget.add_log(f"Processing {current_file.name}", "INFO")
+        if len(batch_files) > 1:
+            self.log_widget.add_log(f"Processing {current_file.name} (+{len(batch_files) - 1} ahead in batch)", "INFO")
+        else:
+            self.log_widget.add_log(f"Processing {current_file.name}", "INFO")
+
+        # Usually already decoded in the background since the image was shown
+        image = self.prefetcher.full_image(current_file, wait=False)
+        self._start_detection(batch_files, {current_file: image} if image is not None else None)
+
+    def _detect_all(self):
+        if not self.image_files or self.detector is None:
+            return
+        if self._detection_running():
+            self.detection_thread.cancel()
+            return
+
+        # From the current image onwards so it and its neighbours are ready first
+        ordered = self.image_files[self.current_index:] + self.image_files[:self.current_index]
+        pending = [image_file for image_file in ordered if image_file not in self.cache]
+        if not pending:
+            self.status_bar.set_status(f"All {len(self.image_files)} images already detected")
+            return
+
+        self.log_widget.add_log(f"Detecting {len(pending)} images in the background", "INFO")
+        self.detect_all_btn.setText("Stop")
+        self._start_detection(pending, detect_all=True)
 
-        result_image, detections = self.detector.detect(self.current_image)
+    def _detection_running(self):
+        return self.detection_thread is not None and self.detection_thread.isRunning()
 
-        self.cache[current_file] = (result_image, detections)
+    def _start_detection(self, image_files, preloaded=None, detect_all=False):
+        self.detecting_all = detect_all
+        self.detection_thread = ImageDetectionThread(self.detector, image_files, preloaded)
+        self.detection_thread.result.connect(self._on_detection_result)
+        self.detection_thread.progress.connect(self._on_detection_progress)
+        self.detection_thread.finished.connect(self._on_detection_finished)
+        self.detection_thread.start()
+
+    def _on_detection_result(self, image_file, entry):
+        if entry is None:
+            self.log_widget.add_log(f"Cannot read image: {image_file.name}", "WARNING")
+            return
+        self._store_result(image_file, entry)
+
+        if not self.image_files or image_file != self.image_files[self.current_index]:
+            return
+        result = self._cached_result(image_file)
+        if result is None:
+            return
+
+        result_image, detections = result
         self._display_image(result_image, self.image_label)
         self._update_status(detections)
 
-        if detections:
-            det_str = ', '.join([f"{d['speed_limit']} km/h ({d['confidence']:.2f})" for d in detections if d.get('speed_limit')])
-            self.log_widget.add_log(f"Detected: {det_str}", "SUCCESS")
-        else:
-            self.log_widget.add_log("No signs detected", "WARNING")
+        if image_file == self.detection_target:
+            self.detection_target = None
+            if detections:
+                det_str = ', '.join([f"{d['speed_limit']} km/h ({d['confidence']:.2f})" for d in detections if d.get('speed_limit')])
+                self.log_widget.add_log(f"Detected: {det_str}", "SUCCESS")
+            else:
+                self.log_widget.add_log("No signs detected", "WARNING")
+
+    def _on_detection_progress(self, done, total, rate):
+        if self.detecting_all:
+            self.detect_all_btn.setText(f"Stop ({done}/{total})")
+            self.status_bar.set_status(f"Detecting: {done}/{total} images ({rate:.1f} img/s)")
+
+    def _on_detection_finished(self, success, summary):
+        self.detect_all_btn.setText("Detect All")
+        if self.detecting_all:
+            self.detecting_all = False
+            if success:
+                self.status_bar.set_status(f"Detection finished: {summary}")
+                self.log_widget.add_log(f"Detection finished: {summary}", "SUCCESS")
+            else:
+                self.status_bar.set_status(f"Detection stopped: {summary}", "warning")
+                self.log_widget.add_log(f"Detection stopped: {summary}", "WARNING")
+        self.log_widget.add_log(f"Result cache: {self.cache.summary()}", "INFO")
+
+    def _collect_detection_batch(self, current_file):
+        """Current image plus the next uncached images of the folder, up to the detector batch size"""
+        batch_files = [current_file]
+        batch_size = self.detector.get_batch_size()
+
+        for image_file in self.image_files[self.current_index + 1:]:
+            if len(batch_files) >= batch_size:
+                break
+            if image_file not in self.cache:
+                batch_files.append(image_file)
+
+        return batch_files
+
+    def _cached_result(self, image_file):
+        """(annotated, detections) without a forward pass, from the result cache.
+
+        On-disk cache hits are already in there, the prefetcher delivers them
+        through candidates_found.
+        """
+        if self.detector is None:
+            return None
+
+        params = self.detector.inference_parameters()
+        entry = self.cache.get(image_file)
+        if entry is None:
+            return None
+        if entry.params == params and entry.detections is not None:
+            return self._render_result(image_file, entry)
+
+        if entry.candidates is None:
+            return None
+        result = self.detector.refilter(None, entry.candidates, render=False)
+        if result is None:
+            return None
+
+        entry.detections, entry.params, entry.render = result[1], params, None
+        return self._render_result(image_file, entry)
+
+    def _render_result(self, image_file, entry):
+        if entry.render is not None:
+            return entry.render, entry.detections
+
+        # Draw on the reduced display decode, boxes scaled down from full-resolution coordinates
+        decoded = self.prefetcher.display_image(image_file)
+        if decoded is None or decoded[0] is None:
+            decoded = self.prefetcher.full_image(image_file, wait=False), 1
+        image, reduction = decoded
+        if image is None:
+            # Still decoding (rendered when loaded() fires) or unreadable, the detections are kept either way
+            self._store_result(image_file, entry)
+            return None
+        detections = entry.detections
+        if reduction > 1:
+            detections = [self._scaled(detection, reduction) for detection in detections]
+
+        annotated = self.detector.annotate(image, detections)
+        if self.cache_renders:
+            entry.render = self._display_copy(annotated)
+        self._store_result(image_file, entry)
+        return annotated, entry.detections
+
+    def _store_result(self, image_file, entry):
+        evicted = self.cache.put(image_file, entry)
+        if evicted:
+            self.log_widget.add_log(f"Result cache evicted {evicted} entries: {self.cache.summary()}", "INFO")
+
+    @staticmethod
+    def _scaled(detection, reduction):
+        detection = detection.copy()
+        detection.bbox = [int(v / reduction) for v in detection.bbox]
+        return detection
+
+    def _display_area(self):
+        container = self.image_label.parent()
+        return max(container.width() - 40, 1), max(container.height() - 40, 1)
+
+    def _display_copy(self, image):
+        """Image downscaled to the display area, the resolution cached renders are kept at"""
+        max_w, max_h = self._display_area()
+        h, w = image.shape[:2]
+        scale = min(max_w / w, max_h / h)
+        if scale >= 1:
+            return image
+        return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
 
     def _update_status(self, detections, cached=False):
         cache_text = " (cached)" if cached else ""
@@ -599,8 +887,12 @@ class SimpleDetectionApp(QMainWindow):
         self.status_bar.set_status("Processing video...")
         self.log_widget.add_log(f"Started processing video: {input_path.name}", "INFO")
 
+        # The job runs on its own detector session, image detection can run alongside it
+        processor = VideoProcessor(self.detector.session())
+        processor.set_log_callback(self.log_widget.add_log)
+
         self.video_thread = VideoProcessingThread(
-            self.video_processor,
+            processor,
             self.current_video_path,
             output_path
         )
@@ -627,6 +919,13 @@ class SimpleDetectionApp(QMainWindow):
             self.status_bar.set_status(f"Processing failed: {result}", "error")
             self.log_widget.add_log(f"Video processing failed: {result}", "ERROR")
 
+    def closeEvent(self, event):
+        if self._detection_running():
+            self.detection_thread.cancel()
+            self.detection_thread.wait()
+        self.prefetcher.shutdown()
+        super().closeEvent(event)
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,96 @@
+"""
+Memory-bounded LRU cache for image tab results
+"""
+
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+# Rough per-detection footprint of a slotted Detection with its tuple and strings
+DETECTION_BYTES = 200
+
+
+class ImageResult:
+    """Everything kept for one image: raw candidates, the detections at params and an optional display render"""
+
+    __slots__ = ('candidates', 'detections', 'params', 'render')
+
+    def __init__(self, candidates=None, detections=None, params=None, render=None):
+        self.candidates = candidates
+        self.detections = detections
+        self.params = params
+        self.render = render
+
+    def nbytes(self):
+        size = sys.getsizeof(self)
+        if self.candidates is not None:
+            size += self.candidates.rows.nbytes
+        if self.detections is not None:
+            size += len(self.detections) * DETECTION_BYTES
+        if isinstance(self.render, np.ndarray):
+            size += self.render.nbytes
+        return size
+
+
+class ResultCache:
+    """LRU cache bounded by the total size of its entries rather than their count.
+
+    Sizes come from the entry's nbytes(), re-measured on every put(), so an
+    entry that grows (a render added) can push older ones out.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """Insert or refresh an entry, returns the number of entries evicted to make room"""
+        self.discard(key)
+        size = entry.nbytes()
+        self.entries[key] = entry
+        self.sizes[key] = size
+        self.bytes_used += size
+
+        evicted = 0
+        # The newest entry always stays, even when it alone exceeds the budget
+        while self.bytes_used > self.max_bytes and len(self.entries) > 1:
+            oldest = next(iter(self.entries))
+            self.discard(oldest)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def discard(self, key):
+        if key in self.entries:
+            del self.entries[key]
+            self.bytes_used -= self.sizes.pop(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.sizes.clear()
+        self.bytes_used = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def summary(self):
+        return (f"{len(self.entries)} entries, {self.bytes_used / 1e6:.1f}/{self.max_bytes / 1e6:.0f} MB, "
+                f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions")
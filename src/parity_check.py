@@ -0,0 +1,120 @@
+"""
+Backend Parity Check against the PyTorch reference
+"""
+
+import argparse
+import copy
+import logging
+import sys
+from pathlib import Path
+
+import cv2
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.backends import BACKENDS
+from src.core.detector import SpeedSignDetector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_images(images_dir, limit):
+    images = []
+    for image_file in sorted(Path(images_dir).glob('*')):
+        image = cv2.imread(str(image_file))
+        if image is not None:
+            images.append((image_file.name, image))
+        if len(images) >= limit:
+            break
+    return images
+
+
+def compare_detections(reference, candidate, box_tolerance, conf_tolerance, conf_threshold):
+    """Mismatch messages between two detection lists of the same image"""
+    mismatches = []
+    unmatched = list(candidate)
+
+    for ref in reference:
+        best = None
+        best_diff = None
+        for cand in unmatched:
+            if cand['class_id'] != ref['class_id']:
+                continue
+            diff = max(abs(a - b) for a, b in zip(ref['bbox'], cand['bbox']))
+            if best_diff is None or diff < best_diff:
+                best, best_diff = cand, diff
+
+        if best is None or best_diff > box_tolerance:
+            # Detections hovering at the threshold may legitimately fall on either side
+            if ref['confidence'] - conf_threshold > conf_tolerance:
+                mismatches.append(f"missing {ref['class_name']} {ref['bbox']} ({ref['confidence']:.3f})")
+            continue
+
+        unmatched.remove(best)
+        if abs(best['confidence'] - ref['confidence']) > conf_tolerance:
+            mismatches.append(f"confidence {ref['class_name']} {ref['bbox']}: "
+                              f"{ref['confidence']:.3f} vs {best['confidence']:.3f}")
+
+    for cand in unmatched:
+        if cand['confidence'] - conf_threshold > conf_tolerance:
+            mismatches.append(f"extra {cand['class_name']} {cand['bbox']} ({cand['confidence']:.3f})")
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that an optimized backend matches PyTorch detections")
+    parser.add_argument('--backend', required=True, choices=[b for b in BACKENDS if b != 'pytorch'])
+    parser.add_argument('--model', default=None, help="Model weights (default: model.yolo_model from config)")
+    parser.add_argument('--config', default='config/settings.yaml')
+    parser.add_argument('--images', default='datasets/test_images')
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--conf', type=float, default=None, help="Confidence threshold (default: from config)")
+    parser.add_argument('--box-tolerance', type=float, default=2.0, help="Max per-coordinate box difference in pixels")
+    parser.add_argument('--conf-tolerance', type=float, default=0.02)
+    args = parser.parse_args()
+
+    # Both sides must really infer, cached detections would hide a backend regression
+    config = SpeedSignDetector._load_config(args.config)
+    config.setdefault('processing', {})['detection_cache'] = False
+    reference = SpeedSignDetector(model_path=args.model, config=config)
+    if not reference.is_model_loaded():
+        logger.error("Model not loaded, nothing to compare")
+        return 1
+
+    config = copy.deepcopy(reference.config)
+    config.setdefault('model', {})['backend'] = args.backend
+    candidate = SpeedSignDetector(model_path=reference.model_path, config=config)
+    if not candidate.is_model_loaded():
+        logger.error(f"{args.backend} backend failed to load")
+        return 1
+
+    conf = args.conf if args.conf is not None else reference.config.get('model', {}).get('confidence_threshold', 0.5)
+    images = load_images(args.images, args.limit)
+    if not images:
+        logger.error(f"No images found in {args.images}")
+        return 1
+
+    failures = 0
+    total = 0
+    for name, image in images:
+        _, ref_detections = reference.detect(image, conf_override=conf)
+        _, cand_detections = candidate.detect(image, conf_override=conf)
+        total += len(ref_detections)
+
+        mismatches = compare_detections(ref_detections, cand_detections, args.box_tolerance, args.conf_tolerance,
+                                        conf)
+        if mismatches:
+            failures += 1
+            logger.warning(f"{name}: {'; '.join(mismatches)}")
+
+    logger.info(f"{args.backend} vs pytorch: {len(images) - failures}/{len(images)} images match "
+                f"({total} reference detections, box tolerance {args.box_tolerance}px, "
+                f"confidence tolerance {args.conf_tolerance})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+INT8 Post-Training Quantization for CPU Deployment
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.backends import OnnxRuntimeBackend, OnnxRuntimeInt8Backend
+from src.core.detector import SpeedSignDetector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def sample_images(images_dir, count, seed=0):
+    images = sorted(p for p in Path(images_dir).glob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    random.Random(seed).shuffle(images)
+    return images[:count]
+
+
+def _calibration_reader(backend, image_paths):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class LetterboxCalibrationReader(CalibrationDataReader):
+        """Feeds calibration images through the same letterbox as inference"""
+
+        def __init__(self):
+            self.paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(str(path))
+                if image is not None:
+                    batch, _ = backend.preprocess([image])
+                    # preprocess() reuses its buffer, the calibrator may hold on to earlier inputs
+                    return {backend.input_name: batch.copy()}
+            return None
+
+    return LetterboxCalibrationReader()
+
+
+def _head_nodes_to_exclude(onnx_path):
+    """Box decoding nodes of the Detect head (DFL, anchors, concat) stay in float, its convs are quantized"""
+    import onnx
+
+    nodes = onnx.load(str(onnx_path)).graph.node
+    indices = [int(n.name.split('/')[1].split('.')[1]) for n in nodes if n.name.startswith('/model.')]
+    head = f"/model.{max(indices)}/"
+    return [n.name for n in nodes if n.name.startswith(head) and '/cv2.' not in n.name and '/cv3.' not in n.name]
+
+
+def quantize_model(model_path, calibration_images, imgsz=640):
+    """Quantize the cached FP32 ONNX export into the INT8 artifact loaded by the onnxruntime-int8 backend"""
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    fp32 = OnnxRuntimeBackend(model_path, imgsz=imgsz)
+    int8_path = OnnxRuntimeInt8Backend.exported_path(model_path, imgsz)
+    prepared_path = int8_path.with_name(int8_path.stem + '-prep.onnx')
+
+    logger.info(f"Calibrating on {len(calibration_images)} images")
+    quant_pre_process(str(fp32.artifact_path), str(prepared_path), skip_symbolic_shape=True)
+    try:
+        quantize_static(
+            str(prepared_path),
+            str(int8_path),
+            _calibration_reader(fp32, calibration_images),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            nodes_to_exclude=_head_nodes_to_exclude(prepared_path),
+        )
+    finally:
+        prepared_path.unlink(missing_ok=True)
+
+    logger.info(f"INT8 model saved: {int8_path}")
+    return fp32.artifact_path, int8_path
+
+
+def evaluate_per_class(model_file, data_config, split, imgsz):
+    """Ultralytics validation, returns {class_name: (p, r, map50, map50_95)} plus an 'all' row"""
+    from ultralytics import YOLO
+
+    metrics = YOLO(str(model_file), task='detect').val(data=data_config, split=split, imgsz=imgsz, batch=1,
+                                                       device='cpu', plots=False, verbose=False)
+    box = metrics.box
+    rows = {}
+    for i, class_index in enumerate(box.ap_class_index):
+        rows[metrics.names[int(class_index)]] = box.class_result(i)
+    rows['all'] = (box.mp, box.mr, box.map50, box.map)
+    return rows
+
+
+def measure_latency(model_path, backend, images, imgsz, warmup=3):
+    """Per-frame detect() latency in ms as (median, p95)"""
+    config = {'model': {'backend': backend, 'confidence_threshold': 0.25, 'iou_threshold': 0.45},
+              'processing': {'input_size': imgsz, 'use_gpu': False}}
+    detector = SpeedSignDetector(model_path=model_path, config=config)
+    if not detector.is_model_loaded():
+        raise RuntimeError(f"{backend} backend failed to load")
+
+    for image in images[:warmup]:
+        detector.detect(image)
+
+    timings = []
+    for image in images:
+        start = time.perf_counter()
+        detector.detect(image)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return float(np.median(timings)), float(np.percentile(timings, 95))
+
+
+def write_report(report_path, model_path, int8_path, calibration_count, accuracy, latency):
+    lines = [
+        "# INT8 Quantization Report",
+        "",
+        f"- **FP32 model:** `{model_path}`",
+        f"- **INT8 model:** `{int8_path}`",
+        f"- **Calibration images:** {calibration_count}",
+        "",
+    ]
+
+    if accuracy:
+        fp32_rows, int8_rows = accuracy
+        lines += [
+            "## Per-Class Performance",
+            "",
+            "| Class          | Precision (FP32 / INT8) | Recall (FP32 / INT8) | mAP@50 (FP32 / INT8) | mAP@50-95 (FP32 / INT8) | Δ mAP@50-95 |",
+            "|----------------|-------------------------|----------------------|----------------------|-------------------------|-------------|",
+        ]
+        for name, fp32 in fp32_rows.items():
+            int8 = int8_rows.get(name, (0.0, 0.0, 0.0, 0.0))
+            label = f"{name} km/h" if str(name).isdigit() else str(name)
+            cells = [f"{a * 100:.1f}% / {b * 100:.1f}%" for a, b in zip(fp32, int8)]
+            delta = (int8[3] - fp32[3]) * 100
+            lines.append(f"| {label:<14} | {cells[0]:<23} | {cells[1]:<20} | {cells[2]:<20} | {cells[3]:<23} | "
+                         f"{delta:+.1f} pts{'':<3} |")
+        lines.append("")
+
+    lines += [
+        "## CPU Latency per Frame",
+        "",
+        "| Backend          | Median    | p95       |",
+        "|------------------|-----------|-----------|",
+    ]
+    for backend, (median, p95) in latency.items():
+        lines.append(f"| {backend:<16} | {median:>7.1f}ms | {p95:>7.1f}ms |")
+    lines.append("")
+
+    report_path.write_text('\n'.join(lines), encoding='utf-8')
+    logger.info(f"Report written: {report_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize best.pt to INT8 and compare it against FP32")
+    parser.add_argument('--model', default='models/speed_limit_recog/weights/best.pt')
+    parser.add_argument('--data', default='datasets/yolo_detection/data.yaml')
+    parser.add_argument('--calibration-dir', default='datasets/yolo_detection/train/images')
+    parser.add_argument('--calibration-samples', type=int, default=300)
+    parser.add_argument('--split', default='val', help="Dataset split for the mAP comparison")
+    parser.add_argument('--latency-images', type=int, default=100)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-eval', action='store_true', help="Skip the mAP comparison, latency only")
+    parser.add_argument('--report', default=None, help="Report path (default: next to the INT8 model)")
+    args = parser.parse_args()
+
+    model_path = Path(args.model)
+    if not model_path.exists():
+        logger.error(f"Model not found: {model_path}")
+        return 1
+
+    calibration_images = sample_images(args.calibration_dir, args.calibration_samples, args.seed)
+    if not calibration_images:
+        logger.error(f"No calibration images found in {args.calibration_dir}")
+        return 1
+
+    _, int8_path = quantize_model(model_path, calibration_images, args.imgsz)
+
+    accuracy = None
+    if not args.skip_eval:
+        logger.info(f"Evaluating FP32 and INT8 on the '{args.split}' split")
+        accuracy = (evaluate_per_class(model_path, args.data, args.split, args.imgsz),
+                    evaluate_per_class(int8_path, args.data, args.split, args.imgsz))
+
+    latency_paths = sample_images(args.calibration_dir, args.latency_images, args.seed + 1)
+    latency_images = [image for image in (cv2.imread(str(p)) for p in latency_paths) if image is not None]
+    latency = {backend: measure_latency(model_path, backend, latency_images, args.imgsz)
+               for backend in ('pytorch', 'onnxruntime', 'onnxruntime-int8')}
+
+    report_path = Path(args.report) if args.report else int8_path.with_name(int8_path.stem + '-report.md')
+    write_report(report_path, model_path, int8_path, len(calibration_images), accuracy, latency)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Record, Re-render and Sweep Video Detections from Raw Candidate Sidecars
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.candidate_sidecar import sidecar_path, sweep_thresholds
+from src.core.detector import SpeedSignDetector
+from src.core.video_processor import VideoProcessor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = {'ERROR': logging.ERROR, 'WARNING': logging.WARNING}
+
+
+def _log(message, level="INFO"):
+    logger.log(LOG_LEVELS.get(level, logging.INFO), message)
+
+
+def _load_config(args):
+    config = SpeedSignDetector._load_config(args.config)
+    config.setdefault('model', {})
+    config.setdefault('processing', {})
+    if getattr(args, 'conf', None) is not None:
+        config['model']['confidence_threshold'] = args.conf
+    if getattr(args, 'iou', None) is not None:
+        config['model']['iou_threshold'] = args.iou
+    if getattr(args, 'floor', None) is not None:
+        config['model']['candidate_confidence'] = args.floor
+    return config
+
+
+def _processor(args, load_model):
+    # Re-rendering only draws recorded candidates, the model is not needed then
+    detector = SpeedSignDetector(model_path=getattr(args, 'model', None), config=_load_config(args),
+                                 load_model=load_model)
+    processor = VideoProcessor(detector)
+    processor.set_log_callback(_log)
+    return processor
+
+
+def record(args):
+    processor = _processor(args, load_model=True)
+    if not processor.detector.is_model_loaded():
+        return 1
+    processing = processor.detector.config['processing']
+    processing['save_candidates'] = True
+    # Candidates are recorded from full-resolution, full-frame inference on every frame
+    for key in ('tracking_enabled', 'motion_gating', 'adaptive_quality', 'roi_enabled'):
+        processing[key] = False
+    processor.detector.config.setdefault('video', {})['decode_width'] = 0
+
+    path = sidecar_path(args.video)
+    previous = path.stat().st_mtime_ns if path.exists() else None
+    if not processor.process_video(args.video, args.output):
+        return 1
+    if not path.exists() or path.stat().st_mtime_ns == previous:
+        logger.error(f"No candidate sidecar was written to {path}")
+        return 1
+    return 0
+
+
+def render(args):
+    processor = _processor(args, load_model=False)
+    output = args.output or str(Path(args.video).with_name(f"{Path(args.video).stem}_rerender.mp4"))
+    return 0 if processor.rerender_video(args.video, output, args.candidates) else 1
+
+
+def sweep(args):
+    path = Path(args.candidates) if args.candidates else sidecar_path(args.video)
+    if not path.exists():
+        logger.error(f"No candidate sidecar found: {path}, run 'record' first")
+        return 1
+
+    max_det = args.max_det or _load_config(args)['model'].get('max_det', 300)
+    counts, frame_count = sweep_thresholds(path, args.confs, args.ious, max_det)
+    if not counts:
+        logger.error("All confidences are below the recorded candidate floor")
+        return 1
+
+    print(f"\n{frame_count} frames from {path.name}\n")
+    print(f"{'Conf':>6} {'IoU':>6} {'Detections':>12} {'Per frame':>10} {'Frames with dets':>17}")
+    for (conf, iou), row in sorted(counts.items()):
+        per_frame = row['detections'] / frame_count if frame_count else 0.0
+        print(f"{conf:>6.2f} {iou:>6.2f} {row['detections']:>12} {per_frame:>10.2f} {row['frames_with_detections']:>17}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-render processed videos at new thresholds without inference")
+    parser.add_argument('--config', default='config/settings.yaml')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="Process a video and save its raw candidates")
+    record_parser.add_argument('video')
+    record_parser.add_argument('--output', default=None, help="Annotated video (default: detections only)")
+    record_parser.add_argument('--model', default=None, help="Model weights (default: model.yolo_model from config)")
+    record_parser.add_argument('--floor', type=float, default=None,
+                               help="Lowest confidence kept, re-rendering works at or above it "
+                                    "(default: model.candidate_confidence from config)")
+
+    render_parser = subparsers.add_parser('render', help="Draw recorded candidates at new thresholds")
+    render_parser.add_argument('video')
+    render_parser.add_argument('--conf', type=float, default=None, help="Confidence threshold (default: from config)")
+    render_parser.add_argument('--iou', type=float, default=None, help="IoU threshold (default: from config)")
+    render_parser.add_argument('--candidates', default=None, help="Sidecar path (default: <video>.candidates)")
+    render_parser.add_argument('--output', default=None, help="Output video (default: <video>_rerender.mp4)")
+
+    sweep_parser = subparsers.add_parser('sweep', help="Detection counts for a grid of thresholds")
+    sweep_parser.add_argument('video')
+    sweep_parser.add_argument('--confs', type=float, nargs='+', default=[0.3, 0.4, 0.5, 0.6, 0.7])
+    sweep_parser.add_argument('--ious', type=float, nargs='+', default=[0.3, 0.45, 0.6])
+    sweep_parser.add_argument('--max-det', type=int, default=None, help="Default: model.max_det from config")
+    sweep_parser.add_argument('--candidates', default=None, help="Sidecar path (default: <video>.candidates)")
+
+    args = parser.parse_args()
+    return {'record': record, 'render': render, 'sweep': sweep}[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())